@@ -1,32 +1,129 @@
-import nuke
-import nukescripts
+import errno
 import os
-import shutil
+import re
+import sys
 import time
-import threading
-from PySide2 import QtWidgets, QtCore, QtGui
-from PySide2.QtCore import Qt
+
+# nuke, threading, json, hashlib and the Qt window are imported where they are used so the dependency data can be
+# imported outside of Nuke and without paying for a GUI
+
+COPY_WORKERS = 16
+VOLUME_WORKERS = 4  # files written at once on the same destination volume
+COPY_BUFFER_SIZE = 8 * 1024 * 1024
+PROGRESS_INTERVAL = 0.25  # seconds
+MANIFEST_NAME = ".export_manifest.json"
+MANIFEST_VERSION = 1
+MANIFEST_SAVE_INTERVAL = 5.0  # seconds, files copied since the last save are copied again after a crash
+PARTIAL_PREFIX = ".partial."  # files being copied, renamed once complete
+HASH_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "export_dependencies", "hashes.json")
+HASH_CACHE_SIZE = 200000  # files
+PARTIAL_HASH_SIZE = 64 * 1024  # bytes hashed at the start and at the end of a file to tell files of a size apart
+
+# frame number of a sequence as nuke writes it: ####, %04d or %d
+FRAME_TOKEN_RE = re.compile("(#+)|%(0?[0-9]*)d")
+# frame range that can follow the file in a file knob: plate.####.exr 1001-1100
+FILE_RANGE_RE = re.compile("^(.*?)\\s+(-?[0-9]+)-(-?[0-9]+)$")
 
 class dependencie():
-    """is associated to a node that contain a file knob, the class contain the full path, the final sub folder and
-    the file name"""
+    """is associated to a node that contain a file knob, the class contain the full path, the final sub folder,
+    the file name and the frame range when the node has one"""
     def __init__(self, node):
         self.node = node
         self.node_name = node.name()
 
         full_file = node['file'].value()
+        self.first = self.last = None
+        file_range = FILE_RANGE_RE.match(full_file)
+        if file_range:
+            full_file = file_range.group(1)
+            self.first, self.last = int(file_range.group(2)), int(file_range.group(3))
+        knobs = node.knobs()
+        if "first" in knobs and "last" in knobs:
+            self.first, self.last = int(node['first'].value()), int(node['last'].value())
         dependend_path = full_file.split("/")[0:-1]
         self.dependend_path = "/".join(dependend_path) + "/"
         self.subpath = full_file.split("/")[-2] + "/"
         self.short_file = full_file.split("/")[-1]
 
 
+def sequence_pattern(short_file):
+    """Will split a file name at its frame number
+
+    :param short_file: file name from a file knob, ex: plate.####.exr
+    :type short_file: string
+    :return: prefix, padding, suffix, None if the file isn't a sequence
+    :rtype: tuple
+    """
+    match = None
+    for match in FRAME_TOKEN_RE.finditer(short_file):
+        pass
+    if match is None:
+        return None
+    if match.group(1):
+        padding = len(match.group(1))
+    else:
+        padding = int(match.group(2) or 0)
+    return short_file[:match.start()], padding, short_file[match.end():]
+
+
+class directory_listings():
+    """Names of the files in each directory. A directory is only listed the first time it is needed, so a plate
+    directory read by many nodes is scanned once per export"""
+    def __init__(self):
+        self.listings = {}
+
+    def files(self, directory):
+        """Will return the names of the files in a directory
+
+        :param directory: directory to list
+        :type directory: string
+        :return: file names, empty if the directory doesn't exist
+        :rtype: set
+        """
+        listing = self.listings.get(directory)
+        if listing is None:
+            listing = set()
+            try:
+                for entry in os.scandir(directory):
+                    try:
+                        if entry.is_file():
+                            listing.add(entry.name)
+                    except OSError:
+                        pass
+            except OSError:
+                pass
+            self.listings[directory] = listing
+        return listing
+
+    def resolve(self, dep):
+        """Will return the files of a dependencie that exist: the file itself, or the frames of its sequence in its
+        frame range. Every frame matching the sequence when the node has no range.
+
+        :param dep: dependencie
+        :type dep: dependencie
+        :return: file names in dep.dependend_path, sorted
+        :rtype: list
+        """
+        listing = self.files(dep.dependend_path)
+        pattern = sequence_pattern(dep.short_file)
+        if pattern is None:
+            return [dep.short_file] if dep.short_file in listing else []
+        prefix, padding, suffix = pattern
+        if dep.first is not None and dep.last is not None:
+            frame_format = prefix.replace("%", "%%") + "%0" + str(padding) + "d" + suffix.replace("%", "%%")
+            names = [frame_format % frame for frame in range(min(dep.first, dep.last), max(dep.first, dep.last) + 1)]
+            return [name for name in names if name in listing]
+        frame_re = re.compile(re.escape(prefix) + "-?[0-9]{%d,}" % max(padding, 1) + re.escape(suffix) + "$")
+        return sorted(name for name in listing if frame_re.match(name))
+
+
 def get_current_script_dependencies():
     """Get current script dependencies. Will return a list of dependencie objects
 
     :return: list of dependencies
     :rtype: list
     """
+    import nuke
     d = []
     for i in nuke.allNodes():
         if "file" not in i.knobs() or i.error():
@@ -46,6 +143,7 @@ def get_selected_nodes_dependencies():
         :return: list of dependencies
         :rtype: list
         """
+    import nuke
     d = []
     for i in nuke.selectedNodes():
         if "file" not in i.knobs() or i.error():
@@ -59,51 +157,699 @@ def get_selected_nodes_dependencies():
     return d
 
 
-def copie_dependencies(path_to_export, dependencies):
+def _copy_file_range(source_fd, destination_fd, copied, size, buffer_size, progress):
+    """Copy in the kernel, without reading the data in python. Server side on NFS 4.2 and a reflink on btrfs/xfs"""
+    while copied < size:
+        count = os.copy_file_range(source_fd, destination_fd, min(buffer_size, size - copied))
+        if not count:
+            break
+        copied += count
+        if progress and progress(count):
+            break
+    return copied
+
+
+def _sendfile(source_fd, destination_fd, copied, size, buffer_size, progress):
+    """Copy in the kernel from the page cache of the source"""
+    while copied < size:
+        count = os.sendfile(destination_fd, source_fd, copied, min(buffer_size, size - copied))
+        if not count:
+            break
+        copied += count
+        if progress and progress(count):
+            break
+    return copied
+
+
+def _copy_buffer(source_fd, destination_fd, copied, size, buffer_size, progress):
+    """Copy through a single large buffer that is reused for the whole file"""
+    buffer = bytearray(min(buffer_size, max(size - copied, 1)))
+    view = memoryview(buffer)
+    with os.fdopen(source_fd, "rb", buffering=0, closefd=False) as source:
+        while True:
+            count = source.readinto(buffer)
+            if not count:
+                break
+            written = 0
+            while written < count:
+                written += os.write(destination_fd, view[written:count])
+            copied += count
+            if progress and progress(count):
+                break
+    return copied
+
+
+# Tried in this order, the next one takes over from where a method stopped when the system or the filesystem
+# doesn't support it
+# sendfile only takes regular files as destination on Linux, other systems want a socket
+COPY_METHODS = [method for name, method in (("copy_file_range", _copy_file_range), ("sendfile", _sendfile))
+                if hasattr(os, name) and (name != "sendfile" or sys.platform.startswith("linux"))] + [_copy_buffer]
+UNSUPPORTED_ERRORS = (errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOTSOCK)
+BINARY = getattr(os, "O_BINARY", 0)  # windows
+
+
+def copy_file(source, destination, buffer_size=COPY_BUFFER_SIZE, progress=None):
+    """Will copie a file and its permissions with the fastest method the system supports
+
+    :param source: file to copie
+    :type source: string
+    :param destination: file to write
+    :type destination: string
+    :param buffer_size: bytes copied at once
+    :type buffer_size: int
+    :param progress: called with the number of bytes copied after each buffer, stop the copy when it returns True
+    :type progress: function
+    :return: True if the whole file was copied
+    :rtype: bool
+    """
+    source_fd = os.open(source, os.O_RDONLY | BINARY)
+    try:
+        stat = os.fstat(source_fd)
+        destination_fd = os.open(destination, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | BINARY, stat.st_mode & 0o777)
+        try:
+            copied = 0
+            for method in COPY_METHODS:
+                os.lseek(source_fd, copied, os.SEEK_SET)
+                os.lseek(destination_fd, copied, os.SEEK_SET)
+                try:
+                    copied = method(source_fd, destination_fd, copied, stat.st_size, buffer_size, progress)
+                    break
+                except OSError as error:
+                    if error.errno not in UNSUPPORTED_ERRORS or method is _copy_buffer:
+                        raise
+                    copied = os.lseek(destination_fd, 0, os.SEEK_CUR)
+            os.ftruncate(destination_fd, copied)
+        finally:
+            os.close(destination_fd)
+    finally:
+        os.close(source_fd)
+    os.chmod(destination, stat.st_mode & 0o7777)
+    return copied >= stat.st_size
+
+
+def file_hash(path, buffer_size=COPY_BUFFER_SIZE):
+    """Will return the sha1 of a file
+
+    :param path: file to hash
+    :type path: string
+    :param buffer_size: bytes read at once
+    :type buffer_size: int
+    :return: hex digest
+    :rtype: string
+    """
+    import hashlib
+    digest = hashlib.sha1()
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+    return digest.hexdigest()
+
+
+def partial_hash(path, size, block_size=PARTIAL_HASH_SIZE):
+    """Will return the sha1 of the start and the end of a file, files that differ usually differ there
+
+    :param path: file to hash
+    :type path: string
+    :param size: size of the file
+    :type size: int
+    :param block_size: bytes hashed at each end
+    :type block_size: int
+    :return: hex digest
+    :rtype: string
+    """
+    import hashlib
+    digest = hashlib.sha1()
+    with open(path, "rb", buffering=0) as f:
+        digest.update(f.read(block_size))
+        if size > block_size:
+            f.seek(max(size - block_size, block_size))
+            digest.update(f.read(block_size))
+    return digest.hexdigest()
+
+
+class hash_cache():
+    """Partial and full hashes of files, keyed on their device, inode, size and modification time so a file is only
+    read again when it changed. It is kept in the user's home to be shared by every export."""
+    def __init__(self, path=HASH_CACHE_PATH, max_size=HASH_CACHE_SIZE):
+        import threading
+        self.path = path
+        self.max_size = max_size
+        self.hashes = {}
+        self._lock = threading.Lock()
+        self._changed = False
+        self.load()
+
+    def load(self):
+        """Will read the cache, a missing or unreadable one is empty"""
+        import json
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION:
+            self.hashes = data.get("hashes", {})
+
+    def save(self):
+        """Will write the cache, keeping the max_size files that were hashed or used last"""
+        import json
+        with self._lock:
+            if not self._changed:
+                return
+            keys = list(self.hashes)
+            for key in keys[:max(len(keys) - self.max_size, 0)]:
+                del self.hashes[key]
+            data = json.dumps({"version": MANIFEST_VERSION, "hashes": self.hashes})
+            self._changed = False
+        folder = os.path.dirname(self.path)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        temp = partial_path(self.path)
+        with open(temp, "w") as f:
+            f.write(data)
+        os.replace(temp, self.path)
+
+    def _entry(self, stat):
+        key = "%d:%d:%d:%d" % (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            # moved to the end, the least recently used files are dropped first
+            entry = self.hashes.pop(key, None) or [None, None]
+            self.hashes[key] = entry
+            self._changed = True
+        return entry
+
+    def partial(self, path, stat):
+        """Will return the partial_hash of a file
+
+        :param path: file to hash
+        :type path: string
+        :param stat: os.stat of the file
+        :type stat: os.stat_result
+        :rtype: string
+        """
+        entry = self._entry(stat)
+        if entry[0] is None:
+            entry[0] = partial_hash(path, stat.st_size)
+        return entry[0]
+
+    def full(self, path, stat):
+        """Will return the file_hash of a file
+
+        :param path: file to hash
+        :type path: string
+        :param stat: os.stat of the file
+        :type stat: os.stat_result
+        :rtype: string
+        """
+        entry = self._entry(stat)
+        if entry[1] is None:
+            entry[1] = file_hash(path)
+        return entry[1]
+
+
+def link_file(existing, destination):
+    """Will make destination a copy of a file that is already exported: a hardlink, or a copy with copy_file_range
+    that is a reflink on filesystems that share blocks (btrfs, xfs) when they can't be hardlinked
+
+    :param existing: exported file
+    :type existing: string
+    :param destination: file to write
+    :type destination: string
+    :return: True if hardlinked
+    :rtype: bool
+    """
+    try:
+        os.link(existing, destination)
+        return True
+    except OSError:
+        pass
+    if not copy_file(existing, destination):
+        raise IOError("Could not copy {0}".format(existing))
+    return False
+
+
+def partial_path(destination):
+    """Will return the name a file has while it is being copied
+
+    :param destination: file to write
+    :type destination: string
+    :return: path in the same folder, so the rename is atomic
+    :rtype: string
+    """
+    folder, name = os.path.split(destination)
+    return os.path.join(folder, PARTIAL_PREFIX + name)
+
+
+class export_manifest():
+    """Record of the files copied to an export folder: their source, size, modification time and, when hashing, their
+    sha1. It is saved in the export folder so running the same export again only copies the files that are missing
+    or changed, and an export that was cancelled or crashed resumes where it stopped."""
+    def __init__(self, path_to_export, hashing=False):
+        import threading
+        self.root = path_to_export
+        self.path = os.path.join(path_to_export, MANIFEST_NAME)
+        self.hashing = hashing
+        self.files = {}
+        self.skipped_files = 0
+        self.skipped_bytes = 0
+        self._lock = threading.Lock()
+        self._changed = False
+        self.load()
+
+    def _key(self, destination):
+        return os.path.relpath(destination, self.root).replace("\\", "/")
+
+    def load(self):
+        """Will read the manifest of the export folder, a missing or unreadable one is empty"""
+        import json
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION:
+            self.files = data.get("files", {})
+
+    def save(self):
+        """Will write the manifest next to the files, through a temporary file so it is never left half written"""
+        import json
+        with self._lock:
+            if not self._changed:
+                return
+            data = json.dumps({"version": MANIFEST_VERSION, "files": self.files})
+            self._changed = False
+        temp = partial_path(self.path)
+        with open(temp, "w") as f:
+            f.write(data)
+        os.replace(temp, self.path)
+
+    def is_unchanged(self, source, destination, stat):
+        """Will return True if destination is a complete copy of the source as it is now
+
+        :param source: file to copie
+        :type source: string
+        :param destination: file to write
+        :type destination: string
+        :param stat: os.stat of the source
+        :type stat: os.stat_result
+        :rtype: bool
+        """
+        entry = self.files.get(self._key(destination))
+        if entry is None or entry.get("source") != source or entry.get("size") != stat.st_size:
+            return False
+        try:
+            if os.stat(destination).st_size != stat.st_size:
+                return False
+        except OSError:
+            return False
+        if entry.get("mtime") != stat.st_mtime:
+            # touched but maybe not modified
+            if not self.hashing or not entry.get("hash") or file_hash(source) != entry["hash"]:
+                return False
+            with self._lock:
+                entry["mtime"] = stat.st_mtime
+                self._changed = True
+        self.skipped_files += 1
+        self.skipped_bytes += stat.st_size
+        return True
+
+    def exported_hashes(self):
+        """Will return the files of the export folder by file_hash, for the files that were hashed
+
+        :return: {hash: (size, destination)}
+        :rtype: dict
+        """
+        return dict((entry["hash"], (entry["size"], os.path.join(self.root, key)))
+                    for key, entry in self.files.items() if entry.get("hash"))
+
+    def record(self, source, destination, stat, digest=None):
+        """Will add a file that was copied
+
+        :param source: file that was copied
+        :type source: string
+        :param destination: file that was written
+        :type destination: string
+        :param stat: os.stat of the source before the copy
+        :type stat: os.stat_result
+        :param digest: file_hash of the file if it is known
+        :type digest: string
+        """
+        entry = {"source": source, "size": stat.st_size, "mtime": stat.st_mtime}
+        if digest is None and self.hashing:
+            digest = file_hash(destination)
+        if digest is not None:
+            entry["hash"] = digest
+        with self._lock:
+            self.files[self._key(destination)] = entry
+            self._changed = True
+
+
+class copy_engine():
+    """Copies files with a bounded pool of threads. The number of files written at once on the same destination
+    volume is limited, so exports to several disks or servers all run at full speed without one of them being
+    flooded. The bytes copied by every thread are added to one progress, that can be shown in a nuke.ProgressTask.
+    Files are written under a temporary name and renamed once complete, with a manifest the files that are already
+    exported are skipped. With a hash_cache, files that have the same content are only copied once and the others
+    are linked to that copy."""
+    def __init__(self, workers=COPY_WORKERS, per_volume=VOLUME_WORKERS, buffer_size=COPY_BUFFER_SIZE, manifest=None,
+                 hashes=None):
+        import threading
+        self.manifest = manifest
+        self.hashes = hashes
+        self.workers = workers
+        self.per_volume = per_volume
+        self.buffer_size = buffer_size
+        self.jobs = []
+        self.links = []
+        self.errors = []
+        self.total_bytes = 0
+        self.copied_bytes = 0
+        self.copied_files = 0
+        self.linked_files = 0
+        self.current_file = ""
+        self.cancelled = False
+        self._lock = threading.Lock()
+        self._volumes = {}
+        self._devices = {}
+        self._destinations = {}
+
+    def add(self, source, destination):
+        """Will add a file to copie, the destination folder has to exist. A file added twice is copied once.
+
+        :param source: file to copie
+        :type source: string
+        :param destination: file to write
+        :type destination: string
+        """
+        try:
+            stat = os.stat(source)
+        except OSError as error:
+            self.errors.append((source, destination, error))
+            return
+        other = self._destinations.get(destination)
+        if other is not None:
+            if other[0] != source and not self._same_content(other[0], other[1], source, stat):
+                self.errors.append((source, destination, IOError("{0} is exported there".format(other[0]))))
+            return
+        self._destinations[destination] = (source, stat)
+        if self.manifest is not None and self.manifest.is_unchanged(source, destination, stat):
+            return
+        folder = os.path.dirname(destination) or "."
+        device = self._devices.get(folder)
+        if device is None:
+            device = self._devices[folder] = os.stat(folder).st_dev
+        self.jobs.append((source, destination, stat, device))
+        self.total_bytes += stat.st_size
+
+    def _same_content(self, source, stat, other_source, other_stat):
+        if self.hashes is None or stat.st_size != other_stat.st_size:
+            return False
+        try:
+            return self.hashes.full(source, stat) == self.hashes.full(other_source, other_stat)
+        except (IOError, OSError):
+            return False
+
+    def _hash_all(self, executor, hash_file, jobs, progress_task):
+        """Will hash the sources of jobs in the threads of executor
+
+        :return: {destination: hash} of the sources that could be read, None if the export was cancelled
+        :rtype: dict
+        """
+        from concurrent import futures
+
+        pending = dict((executor.submit(hash_file, job[0], job[2]), job[1]) for job in jobs)
+        waiting = set(pending)
+        digests = {}
+        while waiting:
+            done, waiting = futures.wait(waiting, timeout=PROGRESS_INTERVAL)
+            for future in done:
+                try:
+                    digests[pending[future]] = future.result()
+                except (IOError, OSError):
+                    pass
+            if progress_task is not None:
+                if progress_task.isCancelled():
+                    self.cancel()
+                progress_task.setMessage("Finding identical files ({0}/{1})".format(len(pending) - len(waiting),
+                                                                                    len(pending)))
+            if self.cancelled:
+                for future in waiting:
+                    future.cancel()
+                return None
+        return digests
+
+    def deduplicate(self, executor, progress_task=None):
+        """Will only keep in jobs one file per content, the others are linked to its copy after the copy. Only the
+        files that have the same size are hashed, the start and the end of the files first. When the manifest keeps
+        hashes, files that are already in the export folder under another name are linked too.
+
+        :param executor: threads hashing the files
+        :type executor: concurrent.futures.ThreadPoolExecutor
+        :param progress_task: progress bar to update, hashing stops when it is cancelled
+        :type progress_task: nuke.ProgressTask
+        """
+        if self.hashes is None:
+            return
+        by_size = {}
+        for job in self.jobs:
+            by_size.setdefault(job[2].st_size, []).append(job)
+        exported = self.manifest.exported_hashes() if self.manifest is not None and self.manifest.hashing else {}
+
+        # files that can't be read are not hashed, they are copied and their error is reported by the copy
+        candidates = [job for size, same_size in by_size.items() if size and (len(same_size) > 1 or exported)
+                      for job in same_size]
+        partials = self._hash_all(executor, self.hashes.partial, candidates, progress_task)
+        if partials is None:
+            return
+        by_partial = {}
+        for job in candidates:
+            if job[1] in partials:
+                by_partial.setdefault((job[2].st_size, partials[job[1]]), []).append(job)
+        # a file alone with its partial hash is only fully hashed to be found in the export folder
+        same_partial = [job for group in by_partial.values() if len(group) > 1 or exported for job in group]
+        fulls = self._hash_all(executor, self.hashes.full, same_partial, progress_task)
+        if fulls is None:
+            return
+        by_full = {}
+        for job in same_partial:
+            if job[1] in fulls:
+                by_full.setdefault((job[2].st_size, fulls[job[1]]), []).append(job)
+
+        linked = set()
+        for (size, digest), group in by_full.items():
+            existing = exported.get(digest)
+            if existing is not None and existing[0] == size:
+                first, existing = None, existing[1]
+            else:
+                first, existing = group[0], group[0][1]
+            for job in group:
+                if job is not first:
+                    self.links.append((job, existing, digest))
+                    linked.add(job[1])
+                    self.total_bytes -= size
+        self.jobs = [job for job in self.jobs if job[1] not in linked]
+
+    def _volume(self, device):
+        import threading
+        with self._lock:
+            semaphore = self._volumes.get(device)
+            if semaphore is None:
+                semaphore = self._volumes[device] = threading.BoundedSemaphore(self.per_volume)
+        return semaphore
+
+    def _progress(self, count):
+        with self._lock:
+            self.copied_bytes += count
+        return self.cancelled
+
+    def _copy(self, job):
+        source, destination, stat, device = job
+        with self._volume(device):
+            if self.cancelled:
+                return
+            self.current_file = os.path.basename(source)
+            # a cancelled or crashed copy never leaves a truncated file under the final name
+            temp = partial_path(destination)
+            try:
+                # a crashed _link can leave a hardlink there, writing through it would change the file it
+                # shares its content with
+                if os.path.lexists(temp):
+                    os.remove(temp)
+                complete = copy_file(source, temp, self.buffer_size, self._progress)
+                if complete:
+                    os.utime(temp, (stat.st_atime, stat.st_mtime))
+                    os.replace(temp, destination)
+                    if self.manifest is not None:
+                        self.manifest.record(source, destination, stat)
+            except (IOError, OSError) as error:
+                complete = False
+                self.errors.append((source, destination, error))
+            if not complete:
+                try:
+                    os.remove(temp)
+                except OSError:
+                    pass
+                return
+            with self._lock:
+                self.copied_files += 1
+
+    def _link(self, link):
+        job, existing, digest = link
+        source, destination, stat, device = job
+        if self.cancelled:
+            return
+        try:
+            if os.stat(existing).st_size != stat.st_size:
+                raise OSError("{0} wasn't exported".format(existing))
+        except OSError:
+            # the file it has the content of couldn't be copied, copy it from its own source
+            with self._lock:
+                self.total_bytes += stat.st_size
+            return self._copy(job)
+        self.current_file = os.path.basename(source)
+        temp = partial_path(destination)
+        try:
+            if os.path.lexists(temp):
+                os.remove(temp)
+            hardlink = link_file(existing, temp)
+            if not hardlink:
+                os.utime(temp, (stat.st_atime, stat.st_mtime))
+            os.replace(temp, destination)
+            if self.manifest is not None:
+                self.manifest.record(source, destination, stat, digest)
+        except (IOError, OSError) as error:
+            self.errors.append((source, destination, error))
+            return
+        with self._lock:
+            self.linked_files += 1
+
+    def cancel(self):
+        """Will stop the copy after the buffer each thread is copying"""
+        self.cancelled = True
+
+    def _wait(self, pending, progress_task, start):
+        from concurrent import futures
+
+        last_save = time.time()
+        while pending:
+            done, pending = futures.wait(pending, timeout=PROGRESS_INTERVAL)
+            if self.manifest is not None and time.time() - last_save > MANIFEST_SAVE_INTERVAL:
+                self.manifest.save()
+                last_save = time.time()
+            if progress_task is not None:
+                if progress_task.isCancelled():
+                    self.cancel()
+                elapsed = max(time.time() - start, 0.001)
+                progress_task.setProgress(int(100 * float(self.copied_bytes) / max(self.total_bytes, 1)))
+                progress_task.setMessage("{0} ({1}/{2} files, {3} linked, {4:.0f} MB/s)".format(
+                    self.current_file, self.copied_files, len(self.jobs), self.linked_files,
+                    self.copied_bytes / elapsed / 1e6))
+            if self.cancelled:
+                for future in pending:
+                    future.cancel()
+
+    def run(self, progress_task=None):
+        """Will copie every file that was added and wait for the end of the copy
+
+        :param progress_task: progress bar to update, the copy is cancelled when it is
+        :type progress_task: nuke.ProgressTask
+        :return: (source, destination, error) of the files that couldn't be copied
+        :rtype: list
+        """
+        from concurrent import futures
+
+        start = time.time()
+        executor = futures.ThreadPoolExecutor(max_workers=max(1, self.workers))
+        try:
+            if progress_task is not None:
+                progress_task.setMessage("Finding identical files")
+            self.deduplicate(executor, progress_task)
+            # biggest files first so a long file doesn't start last and run alone
+            self.jobs.sort(key=lambda job: -job[2].st_size)
+            self._wait(set(executor.submit(self._copy, job) for job in self.jobs), progress_task, start)
+            # once the files they have the content of are copied
+            self._wait(set(executor.submit(self._link, link) for link in self.links), progress_task, start)
+        finally:
+            executor.shutdown(wait=True)
+            if self.manifest is not None:
+                self.manifest.save()
+            if self.hashes is not None:
+                self.hashes.save()
+        return self.errors
+
+
+def copie_dependencies(path_to_export, dependencies, workers=COPY_WORKERS, per_volume=VOLUME_WORKERS,
+                       hashing=False):
     """Will copie list of dependencies to the path specified by user. Dependencies that share the same base location
-    will be place in the same subfolder. Only 1 copy of dependencies that share the same file will be kept to not copy
-    it severals times.
+    will be place in the same subfolder. Only 1 copy of files that have the same content is made, the others are
+    hardlinked to it when the filesystem allows it. The files are copied in parallel by a copy_engine, in a
+    background thread. Files already exported by a previous run, that weren't modified since, are skipped.
 
     :param path_to_export: path to export to
     :type path_to_export: string
     :param dependencies: list of dependencies object
     :type dependencies: list
+    :param workers: number of files copied at once
+    :type workers: int
+    :param per_volume: number of files copied at once on the same destination volume
+    :type per_volume: int
+    :param hashing: keep the sha1 of exported files, so sources that were touched but not modified are skipped
+    :type hashing: bool
+    :return: the thread doing the copy
+    :rtype: threading.Thread
     """
+    import nuke
+    import threading
 
     def copie(dependencies):
-        folders_that_already_exist = [x[0] for x in os.walk(path_to_export)]
-
         progress_bar = nuke.ProgressTask("Copying Dependencies")
 
-
         dependencies_c = []
 
-        # FIND MULTIPLE COPIES OF DEPENDENCIES (KEEP ONLY 1)
-
+        # FIND MULTIPLE COPIES OF DEPENDENCIES (KEEP ONLY 1), files with the same content are found by the engine
+        seen = set()
         for dep in dependencies:
-            if dependencies_c != []:
-                if dep.short_file not in [depp.short_file for depp in dependencies_c]:
-                    dependencies_c.append(dep)
-            else:
+            key = (dep.dependend_path + dep.short_file, dep.first, dep.last)
+            if key not in seen:
+                seen.add(key)
                 dependencies_c.append(dep)
 
-        num_dir = len(dependencies_c)
-
-        ### COPIE
-        for i, d in enumerate(dependencies_c):
+        ### LIST FILES TO COPIE
+        engine = copy_engine(workers, per_volume, manifest=export_manifest(path_to_export, hashing),
+                             hashes=hash_cache())
+        listings = directory_listings()
+        progress_bar.setMessage("Listing files")
+        for d in dependencies_c:
             if progress_bar.isCancelled():
-                break
-            progress_bar.setProgress(int(100*float(i) / num_dir))
-            progress_bar.setMessage(d.short_file)
+                return
             export_dir = path_to_export + d.subpath
-            if os.path.exists(export_dir):
-                pass
-            else:
+            if not os.path.exists(export_dir):
                 os.mkdir(export_dir)
-            files = os.listdir(d.dependend_path)
-            for file in files:
-                if d.short_file.split(".")[0] in file:
-                    shutil.copy(d.dependend_path + file, export_dir + file)
+            for file in listings.resolve(d):
+                engine.add(d.dependend_path + file, export_dir + file)
+
+        ### COPIE
+        errors = engine.run(progress_bar)
+        for source, destination, error in errors:
+            nuke.tprint("Could not copy {0} to {1}: {2}".format(source, destination, error))
 
+    thread = threading.Thread(target=copie, args=(dependencies,))
+    thread.start()
+    return thread
 
-    threading.Thread(target=copie, args=(dependencies,)).start()
\ No newline at end of file
+
+def show_window():
+    """Open the export dependencies window, Qt and the widgets are only imported when it is opened
+
+    :return: the window, keep a reference to it or it will be closed
+    :rtype: export_dependencies_main_window
+    """
+    import export_dependencies_ui
+    window = export_dependencies_ui.export_dependencies_main_window()
+    window.show()
+    return window
@@ -4,6 +4,10 @@ import export_dependencies
 import nukescripts
 import nuke
 
+LABEL_STYLE = "border: 0px double black;"
+SHARED_PATH_STYLE = "border: 0px double black;" "background-color:green;"
+SHARED_FILE_STYLE = "border: 0px double black;" "background-color:yellow;"
+
 class seperator(QtWidgets.QWidget):
     """Use to seperate images sequences and geo inside the dependencie container"""
     def __init__(self, title):
@@ -29,6 +33,9 @@ class dependencie_rec(QtWidgets.QWidget):
         self.setStyleSheet("border: 0.5px double black;" "border-radius: 6px;" "background-color:;")
         self.parent = parent
         self.dependencie = dependencie
+        # if the path/file is shared with other recs, to only restyle the labels when it changes
+        self.shared_path = False
+        self.shared_file = False
 
         self.populate()
 
@@ -66,7 +73,7 @@ class dependencie_rec(QtWidgets.QWidget):
         self.parent.row = self.parent.row - 1
         self.parent.grid.removeWidget(self)
         self.parent.dependencies_recs.remove(self)
-        self.parent.check_for_copies()
+        self.parent.unindex_rec(self)
 
     def mousePressEvent(self, event):
         """When the dependencies rec is being click, nuke node graph will zoom on the node associated with it.
@@ -125,7 +132,7 @@ class dependencies_container(QtWidgets.QWidget):
         self.green_bar.setStyleSheet('background-color:green;')
         self.green_bar.setFixedSize(QtCore.QSize(500, 20))
         self.yellow_bar = QtWidgets.QLabel(
-            "Dependencies that have same file as other dependencie (Will copy it only 1 time)")
+            "Same file as other dependencies, copied once (files with the same content are linked)")
         self.yellow_bar.setFixedSize(QtCore.QSize(500, 20))
         self.yellow_bar.setStyleSheet('background-color:yellow;')
         self.legend_layout.addWidget(self.legend_arrow)
@@ -153,6 +160,10 @@ class dependencies_container(QtWidgets.QWidget):
         self.scrollA.setWidgetResizable(True)
 
         self.row = 0
+        # recs by path and by file name, updated on add and remove so only the recs of a path or a file are restyled.
+        # The recs of a path or a file are the keys of a dict, in the order they were added, to remove them in O(1)
+        self.path_recs = {}
+        self.file_recs = {}
 
         self.QV.addWidget(self.scrollA)
 
@@ -180,40 +191,90 @@ class dependencies_container(QtWidgets.QWidget):
         :param deps: list of dependencies
         :type deps: list
         """
-        for dep in deps:
-            d = dependencie_rec(dep, self)
-            self.dependencies_recs.append(d)
-            self.grid.addWidget(d, self.row, 0)
-            self.row += 1
-
-            self.check_for_copies()
+        # the grid is only laid out and painted once
+        self.gridFrame.setUpdatesEnabled(False)
+        try:
+            for dep in deps:
+                d = dependencie_rec(dep, self)
+                self.dependencies_recs.append(d)
+                self.grid.addWidget(d, self.row, 0)
+                self.row += 1
+
+                self.index_rec(d)
+        finally:
+            self.gridFrame.setUpdatesEnabled(True)
+
+    def index_rec(self, rec):
+        """Will add a dependencie rec to the path and file indexes and restyle the recs that now share its path or
+        its file
+
+        :param rec: dependencie rec that was added
+        :type rec: dependencie_rec
+        """
+        same_path = self.path_recs.setdefault(rec.dependencie.dependend_path, {})
+        same_path[rec] = None
+        same_file = self.file_recs.setdefault(rec.dependencie.short_file, {})
+        same_file[rec] = None
+        self.style_recs(same_path if len(same_path) == 2 else [rec], same_file if len(same_file) == 2 else [rec])
+
+    def unindex_rec(self, rec):
+        """Will remove a dependencie rec from the path and file indexes and restyle the rec that doesn't share its
+        path or its file anymore
+
+        :param rec: dependencie rec that was removed
+        :type rec: dependencie_rec
+        """
+        restyle_path = restyle_file = []
+        same_path = self.path_recs.get(rec.dependencie.dependend_path)
+        if same_path is not None and rec in same_path:
+            del same_path[rec]
+            if not same_path:
+                del self.path_recs[rec.dependencie.dependend_path]
+            restyle_path = same_path
+        same_file = self.file_recs.get(rec.dependencie.short_file)
+        if same_file is not None and rec in same_file:
+            del same_file[rec]
+            if not same_file:
+                del self.file_recs[rec.dependencie.short_file]
+            restyle_file = same_file
+        self.style_recs(restyle_path if len(restyle_path) == 1 else [], restyle_file if len(restyle_file) == 1 else [])
+
+    def style_recs(self, path_recs, file_recs):
+        """Will put in green the path of recs that share their location with other recs and in yellow the file of
+        those that have the same file as other recs. A label is only restyled when that changed.
+
+        :param path_recs: recs to check the path label of
+        :type path_recs: iterable
+        :param file_recs: recs to check the file label of
+        :type file_recs: iterable
+        """
+        for rec in path_recs:
+            shared = len(self.path_recs.get(rec.dependencie.dependend_path, ())) > 1
+            if shared != rec.shared_path:
+                rec.shared_path = shared
+                rec.path_label.setStyleSheet(SHARED_PATH_STYLE if shared else LABEL_STYLE)
+        for rec in file_recs:
+            shared = len(self.file_recs.get(rec.dependencie.short_file, ())) > 1
+            if shared != rec.shared_file:
+                rec.shared_file = shared
+                rec.image_sequence_label.setStyleSheet(SHARED_FILE_STYLE if shared else LABEL_STYLE)
 
     def check_for_copies(self):
         """Will check if dependencies container contains dependencies that share the same location or the same file.
         If so, it will put in green those that share the same location and in yellow those that have the same file"""
+        self.path_recs = {}
+        self.file_recs = {}
         for rec in self.dependencies_recs:
-            for recc in [other for other in self.dependencies_recs if other != rec]:
-                if recc.dependencie.dependend_path == rec.dependencie.dependend_path:
-                    rec.path_label.setStyleSheet("border: 0px double black;" "background-color:green;")
-                    break
-                else:
-                    rec.path_label.setStyleSheet("border: 0px double black;")
-
-            for recc in [other for other in self.dependencies_recs if other != rec]:
-                if recc.dependencie.short_file == rec.dependencie.short_file:
-                    rec.image_sequence_label.setStyleSheet("border: 0px double black;" "background-color:yellow;")
-                    break
-                else:
-                    rec.image_sequence_label.setStyleSheet("border: 0px double black;")
+            self.path_recs.setdefault(rec.dependencie.dependend_path, {})[rec] = None
+            self.file_recs.setdefault(rec.dependencie.short_file, {})[rec] = None
+        self.style_recs(self.dependencies_recs, self.dependencies_recs)
 
     def remove_same_files(self):
         """Will remove from dependencies recs list those that share the same files and copy 1 of them
         (This function is not being used)"""
-        for rec in self.dependencies_recs:
-            for recc in [other for other in self.dependencies_recs if other != rec]:
-                if recc.dependencie.short_file == rec.dependencie.short_file:
-                    rec.click_remove()
-                    break
+        for recs in list(self.file_recs.values()):
+            for rec in list(recs)[1:]:
+                rec.click_remove()
 
     def click_legend_arrow(self, event):
         if self.legend_arrow.state == False:
@@ -0,0 +1,91 @@
+"""Import time of the log and export tools, run with: python import_bench.py --repeat 5
+
+Every module is imported in a fresh interpreter. The data layers have a time budget and a list of modules they
+must not import, the script exits with 1 when one of them goes over, so startup regressions are caught."""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# module: (budget in ms, modules it must not import)
+GUI_MODULES = ("PySide2", "nuke", "nukescripts")
+MODULES = {
+    "logs": (40, GUI_MODULES + ("multiprocessing",)),
+    "logs_stats": (45, GUI_MODULES + ("multiprocessing",)),
+    "logs_index": (50, GUI_MODULES + ("multiprocessing",)),
+    "logs_cache": (60, GUI_MODULES + ("multiprocessing",)),
+    "logs_groups": (45, GUI_MODULES + ("multiprocessing",)),
+    "logs_cli": (60, GUI_MODULES + ("multiprocessing",)),
+    "logs_db": (60, GUI_MODULES + ("multiprocessing",)),
+    # re (about 8ms) is imported for the patterns of file knobs, the module is loaded in every Nuke session
+    "export_dependencies": (20, GUI_MODULES + ("shutil", "threading")),
+    "logs_ui": (None, ()),
+    "export_dependencies_ui": (None, ()),
+}
+IMPORT_TIME_RE = re.compile("^import time: +([0-9]+) \\| +([0-9]+) \\| ( *)(\\S+)$")
+
+
+def importTime(module):
+    """Import a module in a fresh interpreter
+
+    :param module: module name  -str
+    :return: cumulative import time in ms (None if it can't be imported), every imported module  -float, set
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module], cwd=directory,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    imported = set()
+    total = None
+    for line in process.stderr.splitlines():
+        match = IMPORT_TIME_RE.match(line)
+        if match:
+            imported.add(match.group(4).split(".")[0])
+            if match.group(4) == module and not match.group(3):
+                total = int(match.group(2)) / 1000.0
+    if process.returncode:
+        return None, imported
+    return total, imported
+
+
+def benchImports(modules, repeat):
+    """Will return the best import time of each module out of repeat runs and the modules it should not import
+
+    :param modules: {module: (budget, forbidden modules)}  -dict
+    :param repeat: number of runs per module  -int
+    :return: [(module, ms, budget, forbidden modules that were imported)]  -list of tuple
+    """
+    results = []
+    for module, (budget, forbidden) in modules.items():
+        times = []
+        imported = set()
+        for i in range(repeat):
+            total, imported = importTime(module)
+            if total is None:
+                break
+            times.append(total)
+        results.append((module, min(times) if times else None, budget, sorted(imported.intersection(forbidden))))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per module, the best one is kept")
+    args = parser.parse_args()
+
+    failed = False
+    for module, total, budget, leaked in benchImports(MODULES, args.repeat):
+        if total is None:
+            print("%-24s %12s" % (module, "unavailable"))
+            continue
+        over = budget is not None and total > budget
+        status = "over %dms budget" % budget if over else ""
+        if leaked:
+            status = (status + " imports " + ", ".join(leaked)).strip()
+        failed = failed or over or bool(leaked)
+        print("%-24s %10.1fms  %s" % (module, total, status))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
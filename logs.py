@@ -1,7 +1,20 @@
+import gc
+import glob
+import io
+import locale
+import mmap
+import os
 import re
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import compress, count, islice
+from operator import attrgetter
 
 class Num():
     """Contains time, mem, info from a .log file's line"""
+    __slots__ = ("time", "mem", "info", "warning")
+
     def __init__(self, time, mem="", info="", warning=False):
         self.time = time
         self.mem = mem
@@ -9,15 +22,109 @@ class Num():
         self.warning = warning
 
 class Error():
-    """Contains error's info from a .log file's line"""
-    def __init__(self, errorInfo):
+    """Contains error's info from a .log file's line and the time of the last timed line before it"""
+    __slots__ = ("info", "time")
+
+    def __init__(self, errorInfo, time=""):
         self.info = errorInfo
+        self.time = time
 
 
 class Warning():
-    """Contains warning's info from a .log file's line"""
-    def __init__(self, warningInfo):
+    """Contains warning's info from a .log file's line and the time of the last timed line before it"""
+    __slots__ = ("info", "time")
+
+    def __init__(self, warningInfo, time=""):
         self.info = warningInfo
+        self.time = time
+
+
+CHUNK_SIZE = 1024 * 1024
+BATCH_SIZE = 4096
+COLUMNS_BATCH_SIZE = 65536  # Num objects kept before they are added to NumColumns
+DAY = 24 * 3600
+
+# Frame numbers in a line's info, what logs are compared by unless told otherwise
+FRAME_RE = re.compile("frame[ :#=]*([0-9]+)", re.IGNORECASE)
+START_PHASE = "start"
+
+# Line classification, compiled once instead of on every line. A timed line starts with ..:..:.. and its mem is
+# what follows the first run of spaces. LogParser only runs it on lines too short to be sure of without it.
+_TIMED_RE = re.compile("(?=..:..:..)[^ ]*(?: +([^ ]*))?")
+
+
+# Magic bytes of the compressed formats render logs are archived in
+COMPRESSIONS = ((b"\x1f\x8b", "gzip"), (b"BZh", "bz2"), (b"\xfd7zXZ\x00", "xz"), (b"\x28\xb5\x2f\xfd", "zstd"))
+COMPRESSED_EXTENSIONS = (".gz", ".bz2", ".xz", ".zst")
+
+
+def compressionOf(logFile):
+    """Will return how a file is compressed from its first bytes, None when it is plain text
+
+    :param logFile: .log file  -str
+    :return: "gzip", "bz2", "xz", "zstd" or None
+    """
+    with open(logFile, "rb") as logF:
+        magic = logF.read(6)
+    for prefix, compression in COMPRESSIONS:
+        if magic.startswith(prefix):
+            return compression
+    return None
+
+
+def isLogFile(path):
+    """Will return if a path is named like a .log file, compressed (.log.gz...) or not
+
+    :param path: path of a file  -str
+    :return: bool
+    """
+    name = path.lower()
+    for extension in COMPRESSED_EXTENSIONS:
+        if name.endswith(extension):
+            name = name[:-len(extension)]
+            break
+    return name.endswith(".log")
+
+
+def decompressStream(source, compression):
+    """Will return a binary stream decompressing a file while it is read, nothing is written to disk. The
+    decompression modules are only imported when a compressed file is read.
+
+    :param source: path of the file, or the file opened in binary mode which then stays open  -str/file object
+    :param compression: "gzip", "bz2", "xz" or "zstd"  -str
+    :return: file object
+    """
+    if compression == "gzip":
+        import gzip
+        return gzip.open(source, "rb")
+    elif compression == "bz2":
+        import bz2
+        return bz2.open(source, "rb")
+    elif compression == "xz":
+        import lzma
+        return lzma.open(source, "rb")
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Reading zstd compressed logs needs the zstandard module")
+        ownsFile = isinstance(source, str)
+        fileObject = open(source, "rb") if ownsFile else source
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(fileObject, closefd=ownsFile),
+                                 CHUNK_SIZE)
+    raise ValueError("Unknown compression: {0}".format(compression))
+
+
+def openLogFile(logFile):
+    """Open a .log file as text, a compressed file (picked by its magic bytes) is decompressed while it is read
+
+    :param logFile: .log file  -str
+    :return: text stream  -file object
+    """
+    compression = compressionOf(logFile)
+    if compression is None:
+        return open(logFile, "r")
+    return io.TextIOWrapper(decompressStream(logFile, compression))
 
 
 def readLogFile(logFile):
@@ -26,60 +133,1192 @@ def readLogFile(logFile):
     :param logFile: .log file  -str
     :return: str
     """
-    with open(logFile, "r") as logF:
+    with openLogFile(logFile) as logF:
         lines = logF.readlines()
         logF.close()
     return lines
 
 
+def iterLogChunks(logFile, chunkSize=CHUNK_SIZE):
+    """Read a .log file one chunk at a time, the whole file is never held in memory
+
+    :param logFile: .log file  -str
+    :param chunkSize: number of characters read at once  -int
+    :return: generator of complete lines  -list of str
+    """
+    with openLogFile(logFile) as logF:
+        for lines in iterStreamChunks(logF, chunkSize):
+            yield lines
+
+
+def iterStreamChunks(stream, chunkSize=CHUNK_SIZE):
+    """Read a text stream one chunk at a time
+
+    :param stream: opened .log file  -file object
+    :param chunkSize: number of characters read at once  -int
+    :return: generator of complete lines  -list of str
+    """
+    tail = ""
+    while True:
+        chunk = stream.read(chunkSize)
+        if not chunk:
+            break
+        lines = (tail + chunk).split("\n")
+        tail = lines.pop()
+        if lines:
+            yield [line + "\n" for line in lines]
+    if tail:
+        yield [tail]
+
+
+def iterLogLines(logFile, chunkSize=CHUNK_SIZE):
+    """Read lines from a .log file one chunk at a time, the whole file is never held in memory
+
+    :param logFile: .log file  -str
+    :param chunkSize: number of characters read at once  -int
+    :return: generator of str
+    """
+    for lines in iterLogChunks(logFile, chunkSize):
+        for line in lines:
+            yield line
+
+
+class LogParser():
+    """Turn lines from a .log file into Num, Error, Warning objects.
+
+    A timed line containing WARNING flags the previous Num, so the last Num (and what was parsed after it) is
+    held back until the next timed line is fed or flush() is called. When the first timed line contains WARNING,
+    orphanWarning is set since the Num it flags was parsed somewhere else (previous chunk of the file)."""
+    def __init__(self):
+        self.lastNum = None
+        self.held = []
+        self.orphanWarning = False
+
+    def feedLines(self, lines):
+        """Parse lines, will return the records that can't be modified anymore
+
+        :param lines: lines from a .log file  -iterable of str
+        :return: Num, Error, Warning objects  -list
+        """
+        ready = []
+        append = ready.append
+        timedMatch = _TIMED_RE.match
+        lastNum = self.lastNum
+        held = self.held
+
+        for line in lines:
+
+            # Render times/Mem usage. A line only ends with its newline, so one longer than 8 characters with ":" as
+            # its 3rd and 6th is timed without running the regex, its mem is split out instead of captured.
+            if line[2:6:3] == "::" and (len(line) > 8 or timedMatch(line) is not None):
+                parts = line.split(" ", 2)
+                mem = parts[1] if len(parts) > 1 else ""
+                if not mem and len(parts) > 2:
+                    mem = parts[2].lstrip(" ").partition(" ")[0]
+                pipe = line.find("|")
+                num = Num(line[0:8], mem, line[pipe+1:] if pipe != -1 else "")
+
+                if lastNum is not None:
+                    if "WARNING" in line:
+                        lastNum.warning = True
+                    append(lastNum)
+                    if held:
+                        ready.extend(held)
+                        held = []
+                elif "WARNING" in line:
+                    self.orphanWarning = True
+                lastNum = num
+                continue
+
+            first = line[:1]
+
+            # Error
+            if first == "E" and line.startswith("ERROR"):
+                pipe = line.find("|")
+                record = Error(line[pipe+1:] if pipe != -1 else "", lastNum.time if lastNum is not None else "")
+
+            # Warning
+            elif first == "W" and line.startswith("WARNING"):
+                if "| " in line:
+                    info = line[line.find("|")+1:]
+                else:
+                    colon = line.find(":")
+                    info = line[colon+1:] if colon != -1 else ""
+                record = Warning(info, lastNum.time if lastNum is not None else "")
+
+            else:
+                continue
+
+            if lastNum is not None:
+                held.append(record)
+            else:
+                append(record)
+
+        self.lastNum = lastNum
+        self.held = held
+        return ready
+
+    def feed(self, line):
+        """Parse a single line, will return the records that can't be modified anymore
+
+        :param line: line from a .log file  -str
+        :return: Num, Error, Warning objects  -list
+        """
+        return self.feedLines((line,))
+
+    def flush(self):
+        """Will return the records still held back, to call once there are no more lines
+
+        :return: Num, Error, Warning objects  -list
+        """
+        ready = [self.lastNum] + self.held if self.lastNum is not None else self.held
+        self.lastNum = None
+        self.held = []
+        return ready
+
+
+def iterRecords(lines, parser=None):
+    """Will yield Num, Error, Warning objects in the order they appear in lines.
+
+    :param lines: lines from a .log file  -iterable of str
+    :param parser: parser holding the state of previous lines  -LogParser
+    :return: generator of Num, Error, Warning
+    """
+    lines = iter(lines)
+    return iterChunkRecords(iter(lambda: list(islice(lines, BATCH_SIZE)), []), parser)
+
+
+def iterChunkRecordLists(batches, parser=None):
+    """Will yield the Num, Error, Warning objects of each batch of lines (chunk of a .log file) in a list
+
+    :param batches: lines from a .log file  -iterable of list of str
+    :param parser: parser holding the state of previous lines  -LogParser
+    :return: generator of list of Num, Error, Warning
+    """
+    if parser is None:
+        parser = LogParser()
+    for lines in batches:
+        yield parser.feedLines(lines)
+    yield parser.flush()
+
+
+def iterChunkRecords(batches, parser=None):
+    """Will yield Num, Error, Warning objects from batches of lines (chunks of a .log file)
+
+    :param batches: lines from a .log file  -iterable of list of str
+    :param parser: parser holding the state of previous lines  -LogParser
+    :return: generator of Num, Error, Warning
+    """
+    for records in iterChunkRecordLists(batches, parser):
+        for record in records:
+            yield record
+
+
+def iterLogRecords(logFile, chunkSize=CHUNK_SIZE):
+    """Will yield Num, Error, Warning objects from a .log file while reading it, memory stays flat no matter
+    the size of the file.
+
+    :param logFile: .log file  -str
+    :param chunkSize: number of characters read at once  -int
+    :return: generator of Num, Error, Warning
+    """
+    return iterChunkRecords(iterLogChunks(logFile, chunkSize))
+
+
+@contextmanager
+def gcPaused():
+    """Pause the cyclic garbage collector while building large lists of records. Records can't form cycles, so
+    the collector would only rescan every object already parsed again and again."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def splitRecords(records):
+    """Will sort records into lists of Num, Error, Warning objects.
+
+    :param records: Num, Error, Warning objects  -iterable
+    :return: nums, errors, warnings -list, list, list
+    """
+    nums = []
+    errors = []
+    warnings = []
+    appenders = {Num: nums.append, Error: errors.append, Warning: warnings.append}
+
+    with gcPaused():
+        for record in records:
+            appenders[type(record)](record)
+
+    return nums, errors, warnings
+
+
+def parseLogFile(logFile, chunkSize=CHUNK_SIZE):
+    """Will return lists of Num, Error, Warning objects from a .log file without loading all its lines.
+
+    :param logFile: .log file  -str
+    :param chunkSize: number of characters read at once  -int
+    :return: nums, errors, warnings -list, list, list
+    """
+    return splitRecords(iterLogRecords(logFile, chunkSize))
+
+
 def getTimeUsageErrors(lines):
     """Will return lists of Num, Error, Warning objects.
 
     :param lines: lines from a .log file
     :return: nums, errors, warnings -list, list, list
     """
-    nums = []
+    parser = LogParser()
+    with gcPaused():
+        return splitRecords(parser.feedLines(lines) + parser.flush())
+
+
+_MEM_UNITS = {"": 1, "B": 1, "K": 1024, "KB": 1024, "M": 1024 ** 2, "MB": 1024 ** 2, "G": 1024 ** 3,
+              "GB": 1024 ** 3, "T": 1024 ** 4, "TB": 1024 ** 4}
+_MEM_VALUE_RE = re.compile("([0-9]*\\.?[0-9]+) *([KMGT]?B?)$", re.IGNORECASE)
+
+
+def timeToSeconds(time):
+    """Convert a Num's time (HH:MM:SS) to seconds, will return -1 if it is not a valid time
+
+    :param time: time from a .log file's line  -str
+    :return: seconds  -int
+    """
+    if len(time) != 8 or time[2] != ":" or time[5] != ":":
+        return -1
+    hours, minutes, seconds = time[0:2], time[3:5], time[6:8]
+    if not (hours.isdigit() and minutes.isdigit() and seconds.isdigit()):
+        return -1
+    minutes = int(minutes)
+    seconds = int(seconds)
+    if minutes > 59 or seconds > 59:
+        return -1
+    return int(hours) * 3600 + minutes * 60 + seconds
+
+
+def secondsToTime(seconds):
+    """Convert seconds back to a Num's time (HH:MM:SS)
+
+    :param seconds: seconds  -int
+    :return: time  -str
+    """
+    return "%02d:%02d:%02d" % (seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def memToBytes(mem):
+    """Convert a Num's mem (115MB, 1.2GB, 20G...) to a number of bytes, will return -1 if it is not a valid mem
+
+    :param mem: mem from a .log file's line  -str
+    :return: bytes  -int
+    """
+    match = _MEM_VALUE_RE.match(mem.strip())
+    if match is None:
+        return -1
+    return int(float(match.group(1)) * _MEM_UNITS[match.group(2).upper()])
+
+
+_getTime = attrgetter("time")
+_getMem = attrgetter("mem")
+_getInfo = attrgetter("info")
+_getWarning = attrgetter("warning")
+
+
+class NumView():
+    """Num compatible view on a row of NumColumns"""
+    __slots__ = ("columns", "index")
+
+    def __init__(self, columns, index):
+        self.columns = columns
+        self.index = index
+
+    @property
+    def time(self):
+        return self.columns.timeAt(self.index)
+
+    @property
+    def mem(self):
+        return self.columns.memAt(self.index)
+
+    @property
+    def info(self):
+        return self.columns.infoAt(self.index)
+
+    @property
+    def warning(self):
+        return self.columns.warningAt(self.index)
+
+    @warning.setter
+    def warning(self, value):
+        self.columns.setWarning(self.index, value)
+
+
+class NumColumns():
+    """Compact columnar storage of Num. Time is kept in seconds, mem in bytes, warnings in a bitmask and info/mem
+    strings are interned, a row only costs around 20 bytes instead of a Num object and its strings.
+
+    Indexing and iterating give NumView objects that can be used like Num."""
+    def __init__(self):
+        self.times = array("i")
+        self.mems = array("q")
+        self.memIds = array("I")
+        self.infoIds = array("I")
+        self.warnings = bytearray()
+        self.memStrings = []
+        self.infoStrings = []
+        self.rawTimes = {}
+        self._memIndex = {}
+        self._infoIndex = {}
+        self._memBytes = []
+
+    def __len__(self):
+        return len(self.times)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [NumView(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("NumColumns index out of range")
+        return NumView(self, index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield NumView(self, i)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_memIndex"]
+        del state["_infoIndex"]
+        del state["_memBytes"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._memIndex = dict((mem, i) for i, mem in enumerate(self.memStrings))
+        self._infoIndex = dict((info, i) for i, info in enumerate(self.infoStrings))
+        self._memBytes = list(map(memToBytes, self.memStrings))
+
+    def _intern(self, strings, index, value):
+        """Add a new value to interned strings, will return its id"""
+        valueId = index[value] = len(strings)
+        strings.append(value)
+        return valueId
+
+    def _internAll(self, strings, index, values):
+        """Will return the ids of a list of values, interning the new ones. Only the distinct values are looped over
+        in python, the rows are mapped to their ids by builtins"""
+        new = [value for value in dict.fromkeys(values) if value not in index]
+        if new:
+            index.update(zip(new, range(len(strings), len(strings) + len(new))))
+            strings.extend(new)
+        return list(map(index.__getitem__, values))
+
+    def append(self, time, mem="", info="", warning=False):
+        """Add a row
+
+        :param time: time from a .log file's line  -str
+        :param mem: mem from a .log file's line  -str
+        :param info: info from a .log file's line  -str
+        :param warning: the row is flagged as a warning  -bool
+        """
+        row = len(self.times)
+        seconds = timeToSeconds(time)
+        if seconds == -1:
+            self.rawTimes[row] = time
+        self.times.append(seconds)
+
+        memId = self._memIndex.get(mem)
+        if memId is None:
+            memId = self._intern(self.memStrings, self._memIndex, mem)
+            self._memBytes.append(memToBytes(mem))
+        self.memIds.append(memId)
+        self.mems.append(self._memBytes[memId])
+
+        infoId = self._infoIndex.get(info)
+        if infoId is None:
+            infoId = self._intern(self.infoStrings, self._infoIndex, info)
+        self.infoIds.append(infoId)
+
+        if row % 8 == 0:
+            self.warnings.append(0)
+        if warning:
+            self.warnings[row >> 3] |= 1 << (row & 7)
+
+    def appendRows(self, times, mems, infos, warningRows=()):
+        """Add rows at once, much faster than appending them one by one: times and mems are only converted once per
+        distinct value and the columns are extended in bulk
+
+        :param times: times from .log file's lines  -list of str
+        :param mems: mems from .log file's lines  -list of str
+        :param infos: infos from .log file's lines  -list of str
+        :param warningRows: indices in these lists of the rows flagged as a warning  -iterable of int
+        """
+        offset = len(self.times)
+        seconds = dict((time, timeToSeconds(time)) for time in dict.fromkeys(times))
+        self.times.extend(map(seconds.__getitem__, times))
+        if -1 in seconds.values():
+            for row, time in enumerate(times):
+                if seconds[time] == -1:
+                    self.rawTimes[offset + row] = time
+
+        memIds = self._internAll(self.memStrings, self._memIndex, mems)
+        self.memIds.extend(memIds)
+        self._memBytes.extend(map(memToBytes, self.memStrings[len(self._memBytes):]))
+        self.mems.extend(map(self._memBytes.__getitem__, memIds))
+        self.infoIds.extend(self._internAll(self.infoStrings, self._infoIndex, infos))
+
+        self.warnings.extend(bytes((len(self.times) + 7) // 8 - len(self.warnings)))
+        for row in warningRows:
+            self.setWarning(offset + row)
+
+    def appendNums(self, nums):
+        """Add rows from a list of Num objects at once
+
+        :param nums: Num objects  -list
+        """
+        self.appendRows(list(map(_getTime, nums)), list(map(_getMem, nums)), list(map(_getInfo, nums)),
+                        compress(count(), map(_getWarning, nums)))
+
+    def extend(self, nums):
+        """Add rows from Num objects
+
+        :param nums: Num objects or NumColumns  -iterable
+        """
+        if isinstance(nums, NumColumns):
+            self.extendColumns(nums)
+            return
+        nums = iter(nums)
+        for batch in iter(lambda: list(islice(nums, COLUMNS_BATCH_SIZE)), []):
+            self.appendNums(batch)
+
+    def extendColumns(self, other):
+        """Add the rows of other NumColumns
+
+        :param other: rows to add  -NumColumns
+        """
+        offset = len(self)
+        memMap = [self._memIndex.get(mem) for mem in other.memStrings]
+        for i, mem in enumerate(other.memStrings):
+            if memMap[i] is None:
+                memMap[i] = self._intern(self.memStrings, self._memIndex, mem)
+                self._memBytes.append(memToBytes(mem))
+        infoMap = [self._infoIndex.get(info) for info in other.infoStrings]
+        for i, info in enumerate(other.infoStrings):
+            if infoMap[i] is None:
+                infoMap[i] = self._intern(self.infoStrings, self._infoIndex, info)
+
+        self.times.extend(other.times)
+        self.mems.extend(other.mems)
+        self.memIds.extend(array("I", [memMap[i] for i in other.memIds]))
+        self.infoIds.extend(array("I", [infoMap[i] for i in other.infoIds]))
+        for row, time in other.rawTimes.items():
+            self.rawTimes[offset + row] = time
+
+        if offset % 8 == 0:
+            self.warnings.extend(other.warnings)
+        else:
+            self.warnings.extend(bytearray((len(self) + 7) // 8 - len(self.warnings)))
+            for byteIndex, byte in enumerate(other.warnings):
+                if byte:
+                    for bit in range(8):
+                        if byte & (1 << bit):
+                            self.setWarning(offset + byteIndex * 8 + bit)
+
+    def timeAt(self, index):
+        seconds = self.times[index]
+        if seconds == -1:
+            return self.rawTimes[index]
+        return secondsToTime(seconds)
+
+    def memAt(self, index):
+        return self.memStrings[self.memIds[index]]
+
+    def memBytesOf(self, memId):
+        return self._memBytes[memId]
+
+    def infoAt(self, index):
+        return self.infoStrings[self.infoIds[index]]
+
+    def warningAt(self, index):
+        return bool(self.warnings[index >> 3] & (1 << (index & 7)))
+
+    def setWarning(self, index, value=True):
+        if value:
+            self.warnings[index >> 3] |= 1 << (index & 7)
+        else:
+            self.warnings[index >> 3] &= ~(1 << (index & 7)) & 0xff
+
+
+def splitColumnLists(recordLists):
+    """Will sort lists of records into NumColumns and lists of Error, Warning objects. The Num objects of each list
+    are added to the columns at once.
+
+    :param recordLists: lists of Num, Error, Warning objects  -iterable of list
+    :return: nums, errors, warnings -NumColumns, list, list
+    """
+    nums = NumColumns()
     errors = []
     warnings = []
 
-    for line in lines:
+    with gcPaused():
+        for records in recordLists:
+            batchNums = [record for record in records if type(record) is Num]
+            if len(batchNums) != len(records):
+                errors.extend([record for record in records if type(record) is Error])
+                warnings.extend([record for record in records if type(record) is Warning])
+            nums.appendNums(batchNums)
+
+    return nums, errors, warnings
+
+
+def splitColumns(records):
+    """Will sort records into NumColumns and lists of Error, Warning objects. Num objects are added to the columns
+    COLUMNS_BATCH_SIZE at a time.
+
+    :param records: Num, Error, Warning objects  -iterable
+    :return: nums, errors, warnings -NumColumns, list, list
+    """
+    records = iter(records)
+    return splitColumnLists(iter(lambda: list(islice(records, COLUMNS_BATCH_SIZE)), []))
+
+
+def parseLogFileColumns(logFile, chunkSize=CHUNK_SIZE):
+    """Will return NumColumns and lists of Error, Warning objects from a .log file without loading all its lines
+    or keeping a Num object per line.
+
+    :param logFile: .log file  -str
+    :param chunkSize: number of characters read at once  -int
+    :return: nums, errors, warnings -NumColumns, list, list
+    """
+    return splitColumnLists(iterChunkRecordLists(iterLogChunks(logFile, chunkSize)))
+
+
+def findLogFiles(source):
+    """Will return the .log files of a render job, sorted by name
+
+    :param source: directory, glob pattern or list of .log files  -str/list
+    :return: .log files  -list of str
+    """
+    if not isinstance(source, str):
+        return list(source)
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, name) for name in os.listdir(source) if isLogFile(name))
+    return sorted(path for path in glob.glob(source) if os.path.isfile(path))
+
 
-        # Render times/Mem usage
-        if re.search("^..:..:..", line):
+def _parseLogFileWorker(logFile):
+    """Parse a .log file inside a worker process"""
+    return logFile, parseLogFileColumns(logFile)
 
-            time = line[0:8]
 
-            mem = ""
-            memSplit = re.split(" +", line)
-            if len(memSplit) > 1:
-                mem = memSplit[1]
+class JobReport():
+    """Contains the parsed .log files of a render job, each result stays attributed to its file"""
+    def __init__(self):
+        self.files = OrderedDict()
 
-            info = line[re.search("\|", line).start()+1:]
+    def add(self, logFile, nums, errors, warnings):
+        self.files[logFile] = (nums, errors, warnings)
 
-            if "WARNING" in line:
-                newLog.warning = True
+    def nums(self):
+        """Will yield (.log file, Num) for every Num of the job"""
+        for logFile, (nums, errors, warnings) in self.files.items():
+            for num in nums:
+                yield logFile, num
 
-            newLog = Num(time, mem, info)
-            nums.append(newLog)
+    def errors(self):
+        """Will return (.log file, Error) for every Error of the job"""
+        return [(logFile, error) for logFile, (nums, errors, warnings) in self.files.items() for error in errors]
 
-        # Error
-        elif re.search("^ERROR", line):
-            errorInfo = line[re.search("\|", line).start()+1:]
-            newError = Error(errorInfo)
-            errors.append(newError)
+    def warnings(self):
+        """Will return (.log file, Warning) for every Warning of the job"""
+        return [(logFile, warning) for logFile, (nums, errors, warnings) in self.files.items()
+                for warning in warnings]
 
-        # Warning
-        elif re.search("^WARNING", line):
-            warningInfo = ""
-            warningSplitA = re.search("^WARNING.*\| +", line)
-            warningSplitB = re.search("^WARNING.*:", line)
+    def counts(self):
+        """Will return the number of Num, Error, Warning of every .log file
 
-            if warningSplitA:
-                warningInfo = line[re.search("\|", line).start()+1:]
-            elif warningSplitB is not None and warningInfo == "":
-                warningInfo = line[re.search(":", line).start()+1:]
+        :return: {.log file: (nums, errors, warnings)}  -OrderedDict
+        """
+        return OrderedDict((logFile, (len(nums), len(errors), len(warnings)))
+                           for logFile, (nums, errors, warnings) in self.files.items())
 
-            newWarning = Warning(warningInfo)
-            warnings.append(newWarning)
+
+def parseLogJob(source, processes=None):
+    """Parse every .log file of a render job in a pool of processes.
+
+    :param source: directory, glob pattern or list of .log files  -str/list
+    :param processes: number of worker processes, defaults to the number of cores  -int
+    :return: JobReport
+    """
+    logFiles = findLogFiles(source)
+    processes = min(processes or os.cpu_count() or 1, len(logFiles))
+    results = {}
+
+    if processes < 2:
+        for logFile in logFiles:
+            results[logFile] = parseLogFileColumns(logFile)
+    else:
+        # Only imported when a pool is needed, it is slow to import for a command line tool
+        import multiprocessing
+        pool = multiprocessing.Pool(processes)
+        try:
+            for logFile, result in pool.imap_unordered(_parseLogFileWorker, logFiles):
+                results[logFile] = result
+        finally:
+            pool.close()
+            pool.join()
+
+    report = JobReport()
+    for logFile in logFiles:
+        report.add(logFile, *results[logFile])
+    return report
+
+
+class _RangeReader(io.RawIOBase):
+    """Raw binary reader limited to a byte range of a file"""
+    def __init__(self, fileObject, start, end):
+        self.fileObject = fileObject
+        self.fileObject.seek(start)
+        self.remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.remaining)
+        if size <= 0:
+            return 0
+        data = self.fileObject.read(size)
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+
+def splitByteRanges(logFile, parts):
+    """Split a .log file in byte ranges that start right after a newline
+
+    :param logFile: .log file  -str
+    :param parts: number of ranges wanted  -int
+    :return: (start, end) byte ranges  -list of tuple
+    """
+    size = os.path.getsize(logFile)
+    bounds = [0]
+    with open(logFile, "rb") as logF:
+        for part in range(1, parts):
+            # A file smaller than the number of parts would give empty ranges and a seek before its start
+            position = max(size * part // parts, bounds[-1] + 1)
+            if position >= size:
+                break
+            logF.seek(position - 1)
+            position += len(logF.readline()) - 1
+            if bounds[-1] < position < size:
+                bounds.append(position)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _parseRangeWorker(task):
+    """Parse a byte range of a .log file inside a worker process, will also tell if the range starts by flagging the
+    last Num of the previous range"""
+    logFile, start, end = task
+    parser = LogParser()
+    with open(logFile, "rb") as logF:
+        stream = io.TextIOWrapper(io.BufferedReader(_RangeReader(logF, start, end), CHUNK_SIZE))
+        nums, errors, warnings = splitColumnLists(iterChunkRecordLists(iterStreamChunks(stream), parser))
+    return nums, errors, warnings, parser.orphanWarning
+
+
+def parseLogFileParallel(logFile, processes=None, rangesPerProcess=4):
+    """Parse a single .log file with a pool of processes, each of them parsing byte ranges of the file. Ranges are
+    stitched back in order, a timed WARNING line at the start of a range flags the last Num of the previous ranges.
+
+    :param logFile: .log file  -str
+    :param processes: number of worker processes, defaults to the number of cores  -int
+    :param rangesPerProcess: number of byte ranges given to each process  -int
+    :return: nums, errors, warnings -NumColumns, list, list
+    """
+    processes = processes or os.cpu_count() or 1
+    if processes < 2 or compressionOf(logFile) is not None:
+        # A compressed stream can't be started in the middle, it is parsed in one go
+        return parseLogFileColumns(logFile)
+
+    tasks = [(logFile, start, end) for start, end in splitByteRanges(logFile, processes * rangesPerProcess)]
+    if len(tasks) < 2:
+        return parseLogFileColumns(logFile)
+    nums = NumColumns()
+    errors = []
+    warnings = []
+
+    import multiprocessing
+    pool = multiprocessing.Pool(min(processes, len(tasks)))
+    try:
+        for rangeNums, rangeErrors, rangeWarnings, orphanWarning in pool.imap(_parseRangeWorker, tasks):
+            if orphanWarning and len(nums):
+                nums.setWarning(len(nums) - 1)
+            if len(nums):
+                # Errors/warnings before the first timed line of a range come after the last Num of the previous ones
+                lastTime = nums.timeAt(len(nums) - 1)
+                for records in (rangeErrors, rangeWarnings):
+                    for record in records:
+                        if record.time:
+                            break
+                        record.time = lastTime
+            nums.extendColumns(rangeNums)
+            errors.extend(rangeErrors)
+            warnings.extend(rangeWarnings)
+    finally:
+        pool.close()
+        pool.join()
 
     return nums, errors, warnings
+
+
+# Same classification as LogParser, on the raw bytes of a mapped .log file
+_MAPPED_TIMED_RE = re.compile(b"^(?=[^\\n][^\\n]:[^\\n][^\\n]:[^\\n][^\\n])[^ \\n]*(?: +([^ \\n]*))?", re.MULTILINE)
+_MAPPED_ERROR_RE = re.compile(b"^ERROR", re.MULTILINE)
+_MAPPED_WARNING_RE = re.compile(b"^WARNING", re.MULTILINE)
+_MAPPED_NEWLINE_RE = re.compile(b"\n")
+
+
+class MappedLog():
+    """Read a .log file through mmap without decoding it. Lines are found by scanning the raw bytes and only the
+    fields that are asked for are decoded, so counting errors or finding the peak mem never builds the info strings.
+    Opening is instant, the line index is only built the first time a line is accessed by its number. Compressed
+    files can't be mapped, they have to be parsed with iterLogRecords."""
+    def __init__(self, logFile, encoding=None):
+        compression = compressionOf(logFile)
+        if compression is not None:
+            raise ValueError("{0} is {1} compressed and can't be mapped".format(logFile, compression))
+        self.logFile = logFile
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self._file = open(logFile, "rb")
+        if os.fstat(self._file.fileno()).st_size:
+            self.map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.map = b""
+        self._lineStarts = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self._file.close()
+
+    def __len__(self):
+        return len(self.lineStarts())
+
+    def lineStarts(self):
+        """Will return the byte offset of every line
+
+        :return: offsets  -array
+        """
+        if self._lineStarts is None:
+            starts = array("q", [0] if self.map else [])
+            starts.extend(match.end() for match in _MAPPED_NEWLINE_RE.finditer(self.map))
+            if starts and starts[-1] == len(self.map):
+                starts.pop()
+            self._lineStarts = starts
+        return self._lineStarts
+
+    def _decode(self, start, end):
+        return self.map[start:end].decode(self.encoding).replace("\r\n", "\n")
+
+    def line(self, index):
+        """Will return a decoded line
+
+        :param index: line number  -int
+        :return: str
+        """
+        starts = self.lineStarts()
+        end = starts[index + 1] if index + 1 < len(starts) else len(self.map)
+        return self._decode(starts[index], end)
+
+    def countErrors(self):
+        """Will return the number of ERROR lines"""
+        return sum(1 for match in _MAPPED_ERROR_RE.finditer(self.map))
+
+    def countWarnings(self):
+        """Will return the number of WARNING lines"""
+        return sum(1 for match in _MAPPED_WARNING_RE.finditer(self.map))
+
+    def iterMems(self):
+        """Will yield the mem of every timed line in bytes, -1 when it is not a valid mem
+
+        :return: generator of int
+        """
+        decoded = {}
+        for match in _MAPPED_TIMED_RE.finditer(self.map):
+            token = match.group(1) or b""
+            mem = decoded.get(token)
+            if mem is None:
+                mem = decoded[token] = memToBytes(token.decode(self.encoding))
+            yield mem
+
+    def peakMem(self):
+        """Will return the highest mem of the .log file in bytes, -1 if there is none"""
+        return max(self.iterMems(), default=-1)
+
+    def iterNums(self, fields=("time", "mem", "info")):
+        """Will yield the requested fields of every timed line, other fields are never decoded
+
+        :param fields: fields among time, mem, info, warning  -tuple of str
+        :return: generator of tuple
+        """
+        mapped = self.map
+        getters = []
+        for field in fields:
+            if field == "time":
+                getters.append(lambda match, nextMatch: mapped[match.start():match.start() + 8].decode(self.encoding))
+            elif field == "mem":
+                getters.append(lambda match, nextMatch: (match.group(1) or b"").decode(self.encoding))
+            elif field == "info":
+                getters.append(self._infoOf)
+            elif field == "warning":
+                getters.append(self._warningOf)
+            else:
+                raise ValueError("Unknown field: {0}".format(field))
+
+        # WARNING on a timed line flags the previous Num, so every match is read along with the next one
+        previous = None
+        for match in _MAPPED_TIMED_RE.finditer(mapped):
+            if previous is not None:
+                yield tuple(getter(previous, match) for getter in getters)
+            previous = match
+        if previous is not None:
+            yield tuple(getter(previous, None) for getter in getters)
+
+    def _lineEnd(self, position):
+        end = self.map.find(b"\n", position)
+        return len(self.map) if end == -1 else end + 1
+
+    def _infoOf(self, match, nextMatch):
+        end = self._lineEnd(match.end())
+        pipe = self.map.find(b"|", match.start(), end)
+        if pipe == -1:
+            return ""
+        return self._decode(pipe + 1, end)
+
+    def _warningOf(self, match, nextMatch):
+        if nextMatch is None:
+            return False
+        return self.map.find(b"WARNING", nextMatch.start(), self._lineEnd(nextMatch.end())) != -1
+
+
+class LogFollower():
+    """Parse a .log file while it is being written. The byte offset and the parser state are kept between polls
+    so only the bytes appended since the last poll are read and parsed. Only plain text files can be followed."""
+    def __init__(self, logFile, encoding=None):
+        self.logFile = logFile
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.rewound = False
+        self.reset()
+
+    def reset(self):
+        """Forget what was read, the next poll will parse the file from the start"""
+        self.offset = 0
+        self.partial = b""
+        self.parser = LogParser()
+        self.lastStat = None
+
+    def changed(self):
+        """Will tell if the file size or modification time changed since the last poll, a cheap check that can
+        be done often
+
+        :return: bool
+        """
+        try:
+            stat = os.stat(self.logFile)
+        except OSError:
+            return False
+        return (stat.st_size, stat.st_mtime) != self.lastStat
+
+    def poll(self):
+        """Parse what was appended to the file since the last poll. If the file got smaller it was rewritten, it
+        is then parsed from the start and rewound is set.
+
+        :return: nums, errors, warnings -list, list, list
+        """
+        return splitRecords(self.iterPoll())
+
+    def iterPoll(self, chunkSize=CHUNK_SIZE):
+        """Same as poll but will yield the records while the appended bytes are read a chunk at a time
+
+        :param chunkSize: number of bytes read at once  -int
+        :return: generator of Num, Error, Warning
+        """
+        self.rewound = False
+        try:
+            stat = os.stat(self.logFile)
+        except OSError:
+            return
+        if stat.st_size < self.offset:
+            self.reset()
+            self.rewound = True
+        self.lastStat = (stat.st_size, stat.st_mtime)
+
+        with open(self.logFile, "rb") as logF:
+            logF.seek(self.offset)
+            remaining = stat.st_size - self.offset
+            while remaining > 0:
+                block = logF.read(min(chunkSize, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+                self.offset += len(block)
+
+                # Only complete lines are parsed, the rest waits for the next block or poll
+                data = self.partial + block
+                lineEnd = data.rfind(b"\n") + 1
+                self.partial = data[lineEnd:]
+                if lineEnd:
+                    for record in self.parser.feedLines(self._lines(data[:lineEnd])):
+                        yield record
+
+    def _lines(self, data):
+        """Decode bytes into lines the same way a file opened in text mode would"""
+        text = data.decode(self.encoding).replace("\r\n", "\n").replace("\r", "\n")
+        lines = text.split("\n")
+        tail = lines.pop()
+        lines = [line + "\n" for line in lines]
+        if tail:
+            lines.append(tail)
+        return lines
+
+    @property
+    def lastNum(self):
+        """The last timed line read, the parser holds it until the next line tells if a WARNING flags it"""
+        return self.parser.lastNum
+
+    def flush(self):
+        """Parse what is left once the file is complete, including a last line without newline
+
+        :return: nums, errors, warnings -list, list, list
+        """
+        records = self.parser.feedLines(self._lines(self.partial))
+        self.partial = b""
+        return splitRecords(records + self.parser.flush())
+
+
+class PhaseSummary():
+    """Contains the time, mem and problems of a phase of a render log (a frame by default)"""
+    def __init__(self, key):
+        self.key = key
+        self.duration = 0
+        self.peakMem = 0
+        self.memTotal = 0
+        self.memSamples = 0
+        self.lines = 0
+        self.warnings = 0
+        self.errors = 0
+
+    @property
+    def meanMem(self):
+        return float(self.memTotal) / self.memSamples if self.memSamples else 0.0
+
+    def merge(self, other):
+        """Add the time, mem and problems of another phase"""
+        self.duration += other.duration
+        self.peakMem = max(self.peakMem, other.peakMem)
+        self.memTotal += other.memTotal
+        self.memSamples += other.memSamples
+        self.lines += other.lines
+        self.warnings += other.warnings
+        self.errors += other.errors
+
+    def __repr__(self):
+        return "PhaseSummary({0!r}, duration={1}, peakMem={2}, lines={3})".format(
+            self.key, self.duration, self.peakMem, self.lines)
+
+
+def phaseKey(match):
+    """Will return what identifies a phase from a match of its regex, frame numbers are returned as int"""
+    key = match.group(1) if match.re.groups else match.group(0)
+    return int(key) if key.isdigit() else key
+
+
+def summarizePhases(records, phaseRe=FRAME_RE):
+    """Will return the time, mem and problems of each phase of a log while its records stream by, only a summary
+    per phase is kept. A phase starts at the first line whose info matches phaseRe and lasts until the next phase
+    starts, lines before the first phase go to the START_PHASE phase. A phase that comes back (a resumed frame) is
+    added to its first summary. Times are unwrapped at midnight.
+
+    :param records: Num, Error, Warning objects in the order of the log  -iterable
+    :param phaseRe: regex matching the start of a phase, its first group (or the whole match) names it  -re.Pattern
+    :return: {phase: PhaseSummary} in the order phases first appear  -OrderedDict
+    """
+    phases = OrderedDict()
+    current = phases[START_PHASE] = PhaseSummary(START_PHASE)
+    seconds = {}
+    mems = {}
+    search = phaseRe.search
+    phaseStart = None
+    lastTime = None
+    dayOffset = 0
+
+    with gcPaused():
+        for record in records:
+            recordType = type(record)
+            if recordType is Error:
+                current.errors += 1
+                continue
+            elif recordType is not Num:
+                current.warnings += 1
+                continue
+
+            # lastTime only moves forward, a line logged out of order can't give a phase a negative duration
+            time = seconds.get(record.time)
+            if time is None:
+                time = seconds[record.time] = timeToSeconds(record.time)
+            if time != -1:
+                time += dayOffset
+                if lastTime is None:
+                    lastTime = time
+                elif lastTime - time > DAY / 2:
+                    dayOffset += DAY
+                    lastTime = time + DAY
+                elif time > lastTime:
+                    lastTime = time
+
+            match = search(record.info)
+            if match is not None:
+                key = phaseKey(match)
+                if key != current.key:
+                    if phaseStart is not None:
+                        current.duration += lastTime - phaseStart
+                    current = phases.get(key)
+                    if current is None:
+                        current = phases[key] = PhaseSummary(key)
+                    phaseStart = lastTime
+
+            if phaseStart is None:
+                phaseStart = lastTime
+
+            mem = mems.get(record.mem)
+            if mem is None:
+                mem = mems[record.mem] = memToBytes(record.mem)
+            if mem != -1:
+                current.memTotal += mem
+                current.memSamples += 1
+                if mem > current.peakMem:
+                    current.peakMem = mem
+            current.lines += 1
+            if record.warning:
+                current.warnings += 1
+
+    if phaseStart is not None:
+        current.duration += lastTime - phaseStart
+    if not (phases[START_PHASE].lines or phases[START_PHASE].errors or phases[START_PHASE].warnings):
+        del phases[START_PHASE]
+    return phases
+
+
+def summarizeLogPhases(logFile, phaseRe=FRAME_RE, chunkSize=CHUNK_SIZE):
+    """Will return the summary of each phase of a .log file, streaming it so memory only grows with the phases
+
+    :param logFile: .log file  -str
+    :param phaseRe: regex matching the start of a phase  -re.Pattern
+    :param chunkSize: number of characters read at once  -int
+    :return: {phase: PhaseSummary}  -OrderedDict
+    """
+    return summarizePhases(iterLogRecords(logFile, chunkSize), phaseRe)
+
+
+def _summarizePhasesWorker(task):
+    """Summarize the phases of a .log file inside a worker process"""
+    logFile, phaseRe = task
+    return summarizeLogPhases(logFile, phaseRe)
+
+
+class LogComparison():
+    """Phases of two or more logs aligned by their key. Phases are ordered as they first appear in the first log,
+    phases missing from it follow in the order of the other logs. The first log is the base of the deltas."""
+    def __init__(self, logFiles, phases):
+        self.logFiles = list(logFiles)
+        self.phases = phases
+        self.keys = []
+        seen = set()
+        for logPhases in phases:
+            for key in logPhases:
+                if key not in seen:
+                    seen.add(key)
+                    self.keys.append(key)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def row(self, key):
+        """Will return the summary of a phase in each log, None where a log doesn't have it
+
+        :param key: phase  -int/str
+        :return: list of PhaseSummary
+        """
+        return [logPhases.get(key) for logPhases in self.phases]
+
+    def rows(self):
+        """Will yield each phase and its summary in each log"""
+        for key in self.keys:
+            yield key, self.row(key)
+
+    def deltas(self, key, base=0):
+        """Will return how much longer and how much more peak mem a phase took in each log than in the base log
+
+        :param key: phase  -int/str
+        :param base: index of the log the others are compared to  -int
+        :return: [(seconds, bytes)], None where the phase is missing  -list
+        """
+        row = self.row(key)
+        if row[base] is None:
+            return [None] * len(row)
+        return [(summary.duration - row[base].duration, summary.peakMem - row[base].peakMem)
+                if summary is not None else None for summary in row]
+
+    def totals(self):
+        """Will return the summary of every phase added together for each log
+
+        :return: list of PhaseSummary
+        """
+        totals = []
+        for logPhases in self.phases:
+            total = PhaseSummary(None)
+            for summary in logPhases.values():
+                total.merge(summary)
+            totals.append(total)
+        return totals
+
+
+def compareLogs(logFiles, phaseRe=FRAME_RE, processes=None):
+    """Compare the phases (frames by default) of two or more .log files. Each log is streamed into a summary per
+    phase, in a pool of processes when there are cores for it, the summaries are then aligned by phase.
+
+    :param logFiles: .log files, the first one is the base of the deltas  -list of str
+    :param phaseRe: regex matching the start of a phase, its first group names it  -re.Pattern/str
+    :param processes: number of worker processes, defaults to the number of cores  -int
+    :return: LogComparison
+    """
+    if isinstance(phaseRe, str):
+        phaseRe = re.compile(phaseRe, re.IGNORECASE)
+    tasks = [(logFile, phaseRe) for logFile in logFiles]
+    processes = min(processes or os.cpu_count() or 1, len(tasks))
+
+    if processes < 2:
+        phases = [_summarizePhasesWorker(task) for task in tasks]
+    else:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes)
+        try:
+            phases = pool.map(_summarizePhasesWorker, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    return LogComparison(logFiles, phases)
@@ -0,0 +1,431 @@
+"""Benchmarks for logs.py, run with: python logs_bench.py --sizes 1MB,100MB,1GB --output results.jsonl
+
+Synthetic render logs of each size are generated, then every parsing engine reads them in its own process so its
+peak RSS is its own. Each run is written as a json line (engine, size, lines/sec, time to first record, peak RSS...)
+and compared to the runs of a baseline file, a run slower than the baseline by more than the tolerance is reported
+and makes the script exit with 1."""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import logs
+from logs_stats import formatBytes
+
+DEFAULT_SIZES = "1MB,10MB,100MB"
+LINE_LENGTH = 60
+TOLERANCE = 0.1
+MIN_SPEEDUP = 5.0  # getTimeUsageErrors over legacy, what the precompiled classifier has to keep
+
+
+def generateLine(rand, i, warningRatio, errorRatio, padding):
+    """Will return the line i of a synthetic render .log file, 100 lines a second and a frame every 50000 lines"""
+    seconds = i // 100
+    time = "%02d:%02d:%02d" % (seconds // 3600 % 24, seconds // 60 % 60, seconds % 60)
+    mem = "%dMB" % (200 + i // 1000 % 30000)
+    kind = rand.random()
+    if kind < errorRatio:
+        return "ERROR   | [ai] cannot open texture /show/tex/tex_%d.tx%s\n" % (rand.randint(0, 99), padding)
+    elif kind < errorRatio + warningRatio / 2:
+        return "WARNING | [mtoa] node shader_%d has no surface shader%s\n" % (rand.randint(0, 99), padding)
+    elif kind < errorRatio + warningRatio:
+        return "%s %s WARNING | [ai] missing attribute on node_%d%s\n" % (time, mem, rand.randint(0, 99), padding)
+    return "%s %s         | [ai] frame %d bucket %d/%d rendered%s\n" % (
+        time, mem, i // 50000, i % 4096, 4096, padding)
+
+
+def generateLog(logFile, lines=None, warningRatio=0.05, errorRatio=0.02, seed=0, lineLength=LINE_LENGTH, size=None):
+    """Write a synthetic render .log file
+
+    :param logFile: .log file to write  -str
+    :param lines: number of lines, or None to write until size is reached  -int
+    :param warningRatio: part of the lines that are warnings  -float
+    :param errorRatio: part of the lines that are errors  -float
+    :param seed: random seed, same seed gives the same file  -int
+    :param lineLength: average length of the lines, infos are padded to reach it  -int
+    :param size: bytes to write when lines is None  -int
+    :return: number of lines written  -int
+    """
+    rand = random.Random(seed)
+    padding = " " + "x" * (lineLength - 62) if lineLength > 62 else ""
+    written = 0
+    i = 0
+    with open(logFile, "w") as logF:
+        while (i < lines) if lines is not None else (written < size):
+            if lines is None:
+                end = i + max(min(10000, (size - written) // max(lineLength, 1)), 1)
+            else:
+                end = min(i + 10000, lines)
+            batch = [generateLine(rand, n, warningRatio, errorRatio, padding) for n in range(i, end)]
+            logF.writelines(batch)
+            written += sum(map(len, batch))
+            i = end
+    return i
+
+
+def legacyGetTimeUsageErrors(lines):
+    """getTimeUsageErrors as it was before the precompiled classifier, used as the baseline"""
+    nums = []
+    errors = []
+    warnings = []
+    newLog = None
+
+    for line in lines:
+        if re.search("^..:..:..", line):
+            time = line[0:8]
+            mem = ""
+            memSplit = re.split(" +", line)
+            if len(memSplit) > 1:
+                mem = memSplit[1]
+            info = line[re.search("\\|", line).start()+1:]
+            if "WARNING" in line and newLog is not None:
+                newLog.warning = True
+            newLog = logs.Num(time, mem, info)
+            nums.append(newLog)
+        elif re.search("^ERROR", line):
+            errorInfo = line[re.search("\\|", line).start()+1:]
+            errors.append(logs.Error(errorInfo))
+        elif re.search("^WARNING", line):
+            warningInfo = ""
+            warningSplitA = re.search("^WARNING.*\\| +", line)
+            warningSplitB = re.search("^WARNING.*:", line)
+            if warningSplitA:
+                warningInfo = line[re.search("\\|", line).start()+1:]
+            elif warningSplitB is not None and warningInfo == "":
+                warningInfo = line[re.search(":", line).start()+1:]
+            warnings.append(logs.Warning(warningInfo))
+
+    return nums, errors, warnings
+
+
+def _iterCacheBatches(logFile):
+    """Parse through a cold LogCache, batches come out while the file is read"""
+    import logs_cache
+    directory = tempfile.mkdtemp()
+    try:
+        for batch in logs_cache.LogCache(directory).iterParse(logFile):
+            yield batch
+    finally:
+        shutil.rmtree(directory)
+
+
+def _parseGroups(logFile):
+    import logs_groups
+    return logs_groups.parseLogFileGroups(logFile)
+
+
+def _mappedPeakMem(logFile):
+    with logs.MappedLog(logFile) as mapped:
+        return mapped.peakMem()
+
+
+# Engine: function of a .log file giving an iterator, the first item is the first record (or batch of records) an
+# application could show. Engines that only return once everything is parsed give a single item.
+ENGINES = {
+    "legacy": lambda logFile: iter([legacyGetTimeUsageErrors(logs.readLogFile(logFile))]),
+    "getTimeUsageErrors": lambda logFile: iter([logs.getTimeUsageErrors(logs.readLogFile(logFile))]),
+    "iterLogRecords": logs.iterLogRecords,
+    "parseLogFile": lambda logFile: iter([logs.parseLogFile(logFile)]),
+    "parseLogFileColumns": lambda logFile: iter([logs.parseLogFileColumns(logFile)]),
+    "parseLogFileParallel": lambda logFile: iter([logs.parseLogFileParallel(logFile)]),
+    "parseLogFileGroups": lambda logFile: iter([_parseGroups(logFile)]),
+    "cacheIterParse": _iterCacheBatches,
+    "summarizeLogPhases": lambda logFile: iter([logs.summarizeLogPhases(logFile)]),
+    "mappedPeakMem": lambda logFile: iter([_mappedPeakMem(logFile)]),
+}
+# Engines keeping an object per line in memory, not run on logs bigger than --max-in-memory
+IN_MEMORY_ENGINES = ("legacy", "getTimeUsageErrors", "parseLogFile")
+# Engines that need the plain text file, not run on compressed copies
+PLAIN_ENGINES = ("parseLogFileParallel", "mappedPeakMem")
+
+
+# Small logs the parsing engines must agree on, the ones splitting a file in byte ranges get more ranges than bytes
+CHECK_LOGS = {
+    "empty": "",
+    "newline": "\n",
+    "oneLine": "10:00:00 100MB | [ai] frame 1 starting",
+    "noTrailingNewline": "10:00:00 100MB | [ai] frame 1\nWARNING | [ai] late\n10:00:01 200MB WARNING | [ai] a",
+    "untimed": "ERROR   | [ai] cannot open texture\nWARNING | [mtoa] no shader\n",
+}
+CHECK_LINES = (10, 1000, 50000)
+
+
+def _rows(nums, errors, warnings):
+    return ([(num.time, num.mem, num.info, num.warning) for num in nums],
+            [(error.time, error.info) for error in errors], [(warning.time, warning.info) for warning in warnings])
+
+
+def checkEngines(directory):
+    """Parse small and generated logs with parseLogFileColumns and parseLogFileParallel, will return the names of
+    the logs where they don't give the same records as parseLogFile
+
+    :param directory: where the logs are written  -str
+    :return: list of str
+    """
+    logFiles = []
+    for name, text in sorted(CHECK_LOGS.items()):
+        logFiles.append(os.path.join(directory, name + ".log"))
+        with open(logFiles[-1], "w") as logF:
+            logF.write(text)
+    for lines in CHECK_LINES:
+        logFiles.append(os.path.join(directory, "generated%d.log" % lines))
+        generateLog(logFiles[-1], lines)
+        # Without its last newline
+        with open(logFiles[-1], "rb+") as logF:
+            logF.truncate(os.path.getsize(logFiles[-1]) - 1)
+
+    failed = []
+    for logFile in logFiles:
+        expected = _rows(*logs.parseLogFile(logFile))
+        for processes in (2, 4):
+            if _rows(*logs.parseLogFileParallel(logFile, processes, rangesPerProcess=64)) != expected:
+                failed.append("%s parseLogFileParallel %d processes" % (os.path.basename(logFile), processes))
+        if _rows(*logs.parseLogFileColumns(logFile)) != expected:
+            failed.append("%s parseLogFileColumns" % os.path.basename(logFile))
+    return failed
+
+
+def peakRss():
+    """Will return the peak resident memory of this process in MB, None where it can't be known"""
+    # On Linux ru_maxrss survives exec and would include the benchmark process that started this one, the high
+    # water mark of /proc only covers this program
+    try:
+        with open("/proc/self/status") as statusF:
+            for line in statusF:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except (IOError, OSError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 1024.0 ** 2 if sys.platform == "darwin" else maxrss / 1024.0
+
+
+def runEngine(engine, logFile):
+    """Run an engine over a .log file in this process
+
+    :param engine: name of the engine  -str
+    :param logFile: .log file  -str
+    :return: {"seconds", "firstRecordSeconds", "peakRssMB"}  -dict
+    """
+    start = time.perf_counter()
+    first = None
+    for item in ENGINES[engine](logFile):
+        if first is None:
+            first = time.perf_counter() - start
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "firstRecordSeconds": first if first is not None else seconds,
+            "peakRssMB": peakRss()}
+
+
+def benchEngine(engine, logFile):
+    """Run an engine over a .log file in a fresh interpreter, so imports and memory of other runs don't count"""
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-engine", engine, logFile],
+                             stdout=subprocess.PIPE, universal_newlines=True, check=True)
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def countLines(logFile):
+    """Will return the number of lines of a file, read in binary chunks"""
+    count = 0
+    with open(logFile, "rb") as logF:
+        for block in iter(lambda: logF.read(logs.CHUNK_SIZE), b""):
+            count += block.count(b"\n")
+    return count
+
+
+def compressLog(logFile, compression):
+    """Write a compressed copy of a .log file next to it, will return its path or None if the compression module
+    is not available
+
+    :param logFile: .log file  -str
+    :param compression: "gzip", "bz2", "xz" or "zstd"  -str
+    :return: str
+    """
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            return None
+        compressedFile = logFile + ".zst"
+        with open(logFile, "rb") as source, open(compressedFile, "wb") as target:
+            zstandard.ZstdCompressor().copy_stream(source, target)
+        return compressedFile
+
+    import bz2
+    import gzip
+    import lzma
+    openers = {"gzip": (gzip.open, ".gz"), "bz2": (bz2.open, ".bz2"), "xz": (lzma.open, ".xz")}
+    opener, extension = openers[compression]
+    compressedFile = logFile + extension
+    with open(logFile, "rb") as source, opener(compressedFile, "wb") as target:
+        shutil.copyfileobj(source, target, logs.CHUNK_SIZE)
+    return compressedFile
+
+
+def runKey(run):
+    """What makes two runs comparable"""
+    return (run["engine"], run["input"], run["size"], run["warningRatio"], run["errorRatio"], run["lineLength"])
+
+
+def loadRuns(resultsFile):
+    """Will return the runs of a results file, the last run of each kind wins
+
+    :param resultsFile: json lines written by this script  -str
+    :return: {runKey: run}  -dict
+    """
+    runs = {}
+    with open(resultsFile) as resultsF:
+        for line in resultsF:
+            if line.strip():
+                run = json.loads(line)
+                runs[runKey(run)] = run
+    return runs
+
+
+def parseSize(text):
+    size = logs.memToBytes(text)
+    if size <= 0:
+        raise argparse.ArgumentTypeError("Unknown size: {0}".format(text))
+    return size
+
+
+def benchSize(size, engines, compressions, args, directory):
+    """Generate a log of a size and run the engines over it and its compressed copies, will yield each run
+
+    :param size: bytes of the log  -int
+    :param engines: names of the engines  -list of str
+    :param compressions: compressions of the copies  -list of str
+    :param args: parsed command line  -argparse.Namespace
+    :param directory: where the logs are written  -str
+    :return: generator of dict
+    """
+    logFile = os.path.join(directory, "bench.log")
+    generateLog(logFile, None, args.warnings, args.errors, lineLength=args.line_length, size=size)
+    lines = countLines(logFile)
+    inputs = [("plain", logFile)]
+    for compression in compressions:
+        compressedFile = compressLog(logFile, compression)
+        if compressedFile is not None:
+            inputs.append((compression, compressedFile))
+
+    try:
+        for inputName, inputFile in inputs:
+            for engine in engines:
+                if engine in IN_MEMORY_ENGINES and size > args.max_in_memory:
+                    continue
+                if engine in PLAIN_ENGINES and inputName != "plain":
+                    continue
+                run = {"engine": engine, "input": inputName, "size": size, "lines": lines,
+                       "warningRatio": args.warnings, "errorRatio": args.errors, "lineLength": args.line_length,
+                       "python": platform.python_version(), "platform": platform.platform(),
+                       "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+                run.update(benchEngine(engine, inputFile))
+                run["linesPerSecond"] = lines / run["seconds"] if run["seconds"] else 0.0
+                yield run
+    finally:
+        for inputName, inputFile in inputs:
+            os.remove(inputFile)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="sizes of the synthetic logs, from 1MB to 10GB")
+    parser.add_argument("--engines", default=",".join(ENGINES), help="engines to run: " + ", ".join(ENGINES))
+    parser.add_argument("--warnings", type=float, default=0.05, help="ratio of warning lines")
+    parser.add_argument("--errors", type=float, default=0.02, help="ratio of error lines")
+    parser.add_argument("--line-length", type=int, default=LINE_LENGTH, help="average length of the lines")
+    parser.add_argument("--compression", default="", help="also parse compressed copies: gzip,bz2,xz,zstd")
+    parser.add_argument("--max-in-memory", type=parseSize, default=parseSize("1GB"),
+                        help="biggest log given to the engines keeping an object per line")
+    parser.add_argument("--output", help="json lines file the runs are appended to")
+    parser.add_argument("--baseline", help="json lines file of previous runs to compare to")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="slowdown reported as a regression")
+    parser.add_argument("--min-speedup", type=float, default=MIN_SPEEDUP,
+                        help="lowest throughput of getTimeUsageErrors over legacy, checked when both are run")
+    parser.add_argument("--check", action="store_true",
+                        help="only check the engines give the same records as parseLogFile on small logs")
+    parser.add_argument("--run-engine", nargs=2, metavar=("ENGINE", "LOG"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_engine:
+        print(json.dumps(runEngine(*args.run_engine)))
+        return 0
+
+    if args.check:
+        directory = tempfile.mkdtemp()
+        try:
+            failed = checkEngines(directory)
+        finally:
+            shutil.rmtree(directory)
+        for name in failed:
+            print("Different records: " + name)
+        print("%d differences" % len(failed))
+        return 1 if failed else 0
+
+    engines = [engine for engine in args.engines.split(",") if engine]
+    unknown = [engine for engine in engines if engine not in ENGINES]
+    if unknown:
+        parser.error("Unknown engines: " + ", ".join(unknown))
+    compressions = [compression for compression in args.compression.split(",") if compression]
+    sizes = [parseSize(text) for text in args.sizes.split(",") if text]
+    baseline = loadRuns(args.baseline) if args.baseline else {}
+    regressions = 0
+    slowSpeedups = 0
+
+    print("%-22s %-6s %10s %8s %14s %10s %9s %9s" % (
+        "engine", "input", "size", "lines", "lines/sec", "first (s)", "RSS (MB)", "baseline"))
+    directory = tempfile.mkdtemp()
+    try:
+        for size in sizes:
+            linesPerSecond = {}
+            for run in benchSize(size, engines, compressions, args, directory):
+                linesPerSecond[run["engine"], run["input"]] = run["linesPerSecond"]
+                comparison = ""
+                previous = baseline.get(runKey(run))
+                if previous is not None and previous["linesPerSecond"]:
+                    ratio = run["linesPerSecond"] / previous["linesPerSecond"]
+                    comparison = "%.2fx" % ratio
+                    if ratio < 1 - args.tolerance:
+                        comparison += " SLOWER"
+                        regressions += 1
+
+                print("%-22s %-6s %10s %8d %14.0f %10.3f %9s %9s" % (
+                    run["engine"], run["input"], formatBytes(size), run["lines"], run["linesPerSecond"],
+                    run["firstRecordSeconds"], "%.1f" % run["peakRssMB"] if run["peakRssMB"] else "-", comparison))
+                if args.output:
+                    with open(args.output, "a") as outputF:
+                        outputF.write(json.dumps(run) + "\n")
+
+            for (engine, inputName), legacySpeed in sorted(linesPerSecond.items()):
+                newSpeed = linesPerSecond.get(("getTimeUsageErrors", inputName))
+                if engine != "legacy" or not legacySpeed or newSpeed is None:
+                    continue
+                speedup = newSpeed / legacySpeed
+                print("getTimeUsageErrors/legacy on {0} {1}: {2:.2f}x{3}".format(
+                    formatBytes(size), inputName, speedup, "" if speedup >= args.min_speedup else
+                    " BELOW {0:.1f}x".format(args.min_speedup)))
+                if speedup < args.min_speedup:
+                    slowSpeedups += 1
+    finally:
+        shutil.rmtree(directory)
+
+    if regressions:
+        print("%d runs are more than %d%% slower than the baseline" % (regressions, args.tolerance * 100))
+    if slowSpeedups:
+        print("getTimeUsageErrors is less than %.1fx faster than legacy on %d logs" % (args.min_speedup, slowSpeedups))
+    return 1 if regressions or slowSpeedups else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
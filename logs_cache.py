@@ -0,0 +1,253 @@
+"""On-disk cache of parsed .log files"""
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+
+from itertools import islice
+
+from logs import (LogFollower, NumColumns, compressionOf, decompressStream, iterChunkRecords, iterStreamChunks,
+                  splitColumns)
+
+CACHE_VERSION = 4
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "render_logs")
+DEFAULT_MAX_SIZE = 2 * 1024 ** 3
+HASH_SIZE = 64 * 1024
+FIRST_BATCH_SIZE = 1000
+BATCH_SIZE = 50000
+
+
+def hashRange(logFile, start, end):
+    """Will return the sha1 of a byte range of a file
+
+    :param logFile: .log file  -str
+    :param start: first byte  -int
+    :param end: byte after the last one  -int
+    :return: str
+    """
+    with open(logFile, "rb") as logF:
+        logF.seek(start)
+        return hashlib.sha1(logF.read(max(end - start, 0))).hexdigest()
+
+
+class CacheEntry():
+    """Contains the parse of a .log file and what identifies the file it came from. The follower is kept as it
+    was before its last records were flushed, so an appended file can be parsed from where it stopped. Compressed
+    files are always parsed whole, archives are not appended to."""
+    def __init__(self, logFile):
+        self.version = CACHE_VERSION
+        self.logFile = logFile
+        self.compression = compressionOf(logFile)
+        self.size = 0
+        self.mtime = 0
+        self.prefixHash = ""
+        self.tailHash = ""
+        self.follower = LogFollower(logFile)
+        self.nums = NumColumns()
+        self.errors = []
+        self.warnings = []
+
+    def identify(self):
+        """Record size, mtime and hashes of the file as the follower last read it"""
+        self.size, self.mtime = self.follower.lastStat
+        self.prefixHash = hashRange(self.logFile, 0, min(HASH_SIZE, self.size))
+        self.tailHash = hashRange(self.logFile, max(self.size - HASH_SIZE, 0), self.size)
+
+    def matches(self, stat):
+        """The file was not modified since it was cached"""
+        return (self.size == stat.st_size and self.mtime == stat.st_mtime and
+                self.prefixHash == hashRange(self.logFile, 0, min(HASH_SIZE, self.size)))
+
+    def isPrefixOf(self, stat):
+        """The file only had lines appended since it was cached"""
+        return (self.compression is None and stat.st_size > self.size and
+                self.prefixHash == hashRange(self.logFile, 0, min(HASH_SIZE, self.size)) and
+                self.tailHash == hashRange(self.logFile, max(self.size - HASH_SIZE, 0), self.size))
+
+    def parseAppended(self):
+        """Parse what the follower did not read yet"""
+        nums, errors, warnings = splitColumns(self.iterRecords())
+        self.nums.extendColumns(nums)
+        self.errors.extend(errors)
+        self.warnings.extend(warnings)
+
+    def iterAppended(self, batchSize=BATCH_SIZE, firstBatchSize=FIRST_BATCH_SIZE):
+        """Parse what the follower did not read yet, will yield new batches of records while they are parsed. The
+        first batch is small so the first records come out right away.
+
+        :param batchSize: number of records in a batch  -int
+        :param firstBatchSize: number of records in the first batch  -int
+        :return: generator of (nums, errors, warnings) -NumColumns, list, list
+        """
+        records = self.iterRecords()
+        size = firstBatchSize
+        while True:
+            nums, errors, warnings = splitColumns(islice(records, size))
+            if not (len(nums) or errors or warnings):
+                return
+            self.nums.extendColumns(nums)
+            self.errors.extend(errors)
+            self.warnings.extend(warnings)
+            yield nums, errors, warnings
+            size = batchSize
+
+    def iterRecords(self):
+        """Will yield the records the follower did not read yet, a compressed file is decompressed while it is read
+        and the follower's offset follows the compressed bytes read so far"""
+        if self.compression is None:
+            return self.follower.iterPoll()
+        return iterChunkRecords(self._iterCompressedChunks())
+
+    def _iterCompressedChunks(self):
+        stat = os.stat(self.logFile)
+        self.follower.lastStat = (stat.st_size, stat.st_mtime)
+        with open(self.logFile, "rb") as logF:
+            for lines in iterStreamChunks(io.TextIOWrapper(decompressStream(logF, self.compression))):
+                self.follower.offset = logF.tell()
+                yield lines
+
+    def results(self):
+        """Will return the parse of the complete file, the entry should not be saved after this
+
+        :return: nums, errors, warnings -NumColumns, list, list
+        """
+        nums, errors, warnings = self.follower.flush()
+        self.nums.extend(nums)
+        self.errors.extend(errors)
+        self.warnings.extend(warnings)
+        return self.nums, self.errors, self.warnings
+
+
+class LogCache():
+    """Cache of parsed .log files, keyed on the path, size, mtime and a hash of the first bytes of the file. Entries
+    are pickled into a directory and the least recently used ones are removed once the directory gets bigger than
+    maxSize. A file that only had lines appended reuses its entry and only its new bytes are parsed."""
+    def __init__(self, directory=DEFAULT_DIRECTORY, maxSize=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.maxSize = maxSize
+
+    def entryPath(self, logFile):
+        """Will return where the entry of a .log file is saved"""
+        key = hashlib.sha1(os.path.abspath(logFile).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key + ".cache")
+
+    def load(self, logFile):
+        """Will return the cached entry of a .log file, None if there is none or it can't be read"""
+        try:
+            with open(self.entryPath(logFile), "rb") as entryF:
+                entry = pickle.load(entryF)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        if getattr(entry, "version", None) != CACHE_VERSION or entry.logFile != os.path.abspath(logFile):
+            return None
+        try:
+            os.utime(self.entryPath(logFile), None)
+        except (IOError, OSError):
+            pass
+        return entry
+
+    def trySave(self, entry):
+        """Save an entry, a cache that can't be written (read-only, full, missing drive) must not lose the parse
+
+        :return: if the entry was saved  -bool
+        """
+        try:
+            self.save(entry)
+        except (IOError, OSError):
+            return False
+        return True
+
+    def save(self, entry):
+        """Write an entry next to its final name then rename it so readers never see a partial entry"""
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        handle, tempPath = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as entryF:
+                pickle.dump(entry, entryF, pickle.HIGHEST_PROTOCOL)
+            os.replace(tempPath, self.entryPath(entry.logFile))
+        except Exception:
+            os.remove(tempPath)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in maxSize"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".cache"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for mtime, size, name in entries)
+        for mtime, size, name in sorted(entries):
+            if total <= self.maxSize:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+    def parse(self, logFile):
+        """Will return the parse of a .log file from the cache, parsing only what is not cached yet
+
+        :param logFile: .log file  -str
+        :return: nums, errors, warnings -NumColumns, list, list
+        """
+        logFile = os.path.abspath(logFile)
+        stat = os.stat(logFile)
+        entry = self.load(logFile)
+
+        if entry is not None and entry.matches(stat):
+            return entry.results()
+
+        if entry is None or not entry.isPrefixOf(stat):
+            entry = CacheEntry(logFile)
+        entry.parseAppended()
+        entry.identify()
+        self.trySave(entry)
+        return entry.results()
+
+    def iterParse(self, logFile, batchSize=BATCH_SIZE, progress=None):
+        """Same as parse but will yield the parse in batches while it goes, what was cached comes first. The entry
+        is only saved once the whole file was read, stopping the iteration early leaves the cache untouched.
+
+        :param logFile: .log file  -str
+        :param batchSize: number of records in a batch  -int
+        :param progress: called with the bytes read and the size of the file  -callable
+        :return: generator of (nums, errors, warnings) -NumColumns, list, list
+        """
+        logFile = os.path.abspath(logFile)
+        stat = os.stat(logFile)
+        entry = self.load(logFile)
+
+        if entry is not None and entry.matches(stat):
+            yield entry.results()
+            return
+
+        if entry is None or not entry.isPrefixOf(stat):
+            entry = CacheEntry(logFile)
+        elif len(entry.nums) or entry.errors or entry.warnings:
+            cachedNums = NumColumns()
+            cachedNums.extendColumns(entry.nums)
+            yield cachedNums, list(entry.errors), list(entry.warnings)
+
+        for batch in entry.iterAppended(batchSize):
+            if progress is not None:
+                progress(entry.follower.offset, stat.st_size)
+            yield batch
+
+        entry.identify()
+        self.trySave(entry)
+        nums, errors, warnings = entry.follower.flush()
+        lastNums = NumColumns()
+        lastNums.extend(nums)
+        yield lastNums, errors, warnings
+
+
+def parseLogFileCached(logFile, cache=None):
+    """Will return NumColumns and lists of Error, Warning objects from a .log file, using the on-disk cache
+
+    :param logFile: .log file  -str
+    :param cache: cache to use, defaults to the cache in the user's home  -LogCache
+    :return: nums, errors, warnings -NumColumns, list, list
+    """
+    return (cache or LogCache()).parse(logFile)
@@ -0,0 +1,168 @@
+"""Parse render .log files without Qt and export their records and a summary.
+
+    python logs_cli.py /renders/job/*.log -o records.jsonl --summary summary.json
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+import logs
+import logs_groups
+import logs_stats
+
+FORMATS = ("jsonl", "csv", "parquet")
+FIELDS = ["file", "type", "time", "seconds", "mem", "memBytes", "warning", "info"]
+PROBLEMS = 20
+
+
+def iterRows(logFile, nums, errors, warnings):
+    """Will yield a dict per record of a parsed .log file
+
+    :param logFile: .log file the records come from  -str
+    :param nums: parsed time/mem  -NumColumns
+    :param errors: Error objects  -list
+    :param warnings: Warning objects  -list
+    :return: generator of dict
+    """
+    for row in range(len(nums)):
+        yield {"file": logFile, "type": "num", "time": nums.timeAt(row), "seconds": nums.times[row],
+               "mem": nums.memAt(row), "memBytes": nums.mems[row], "warning": nums.warningAt(row),
+               "info": nums.infoAt(row).rstrip("\n")}
+    for kind, records in (("warning", warnings), ("error", errors)):
+        for record in records:
+            yield {"file": logFile, "type": kind, "time": record.time, "seconds": logs.timeToSeconds(record.time),
+                   "mem": "", "memBytes": -1, "warning": kind == "warning", "info": record.info.rstrip("\n")}
+
+
+def writeJsonLines(results, output):
+    for logFile, (nums, errors, warnings) in results:
+        for row in iterRows(logFile, nums, errors, warnings):
+            output.write(json.dumps(row))
+            output.write("\n")
+
+
+def writeCsv(results, output):
+    writer = csv.DictWriter(output, FIELDS)
+    writer.writeheader()
+    for logFile, (nums, errors, warnings) in results:
+        writer.writerows(iterRows(logFile, nums, errors, warnings))
+
+
+def writeParquet(results, outputPath):
+    """Write the records as a Parquet table, columns are built straight from NumColumns"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise SystemExit("The parquet format needs pyarrow, use jsonl or csv instead")
+
+    columns = dict((field, []) for field in FIELDS)
+    for logFile, (nums, errors, warnings) in results:
+        count = len(nums)
+        columns["file"].extend([logFile] * count)
+        columns["type"].extend(["num"] * count)
+        columns["time"].extend(nums.timeAt(row) for row in range(count))
+        columns["seconds"].extend(nums.times)
+        columns["mem"].extend(nums.memAt(row) for row in range(count))
+        columns["memBytes"].extend(nums.mems)
+        columns["warning"].extend(nums.warningAt(row) for row in range(count))
+        columns["info"].extend(nums.infoAt(row).rstrip("\n") for row in range(count))
+        for kind, records in (("warning", warnings), ("error", errors)):
+            columns["file"].extend([logFile] * len(records))
+            columns["type"].extend([kind] * len(records))
+            columns["time"].extend(record.time for record in records)
+            columns["seconds"].extend(logs.timeToSeconds(record.time) for record in records)
+            columns["mem"].extend([""] * len(records))
+            columns["memBytes"].extend([-1] * len(records))
+            columns["warning"].extend([kind == "warning"] * len(records))
+            columns["info"].extend(record.info.rstrip("\n") for record in records)
+    pyarrow.parquet.write_table(pyarrow.table(columns), outputPath)
+
+
+def summarizeFile(nums, errors, warnings, problems=PROBLEMS):
+    """Will return the summary of a parsed .log file as a dict ready for json, with its most repeated problems"""
+    stats = logs_stats.summarize(nums)
+    groups = logs_groups.ProblemGroups()
+    groups.addRecords(errors, warnings)
+    return {"lines": len(nums), "errors": len(errors), "warnings": len(warnings),
+            "totalTime": stats.totalTime, "peakMem": stats.peakMem, "meanMem": stats.meanMem,
+            "memPercentiles": dict((str(p), value) for p, value in stats.memPercentiles.items()),
+            "memGrowthRate": stats.memGrowthRate,
+            "frameDurations": dict((str(frame), seconds) for frame, seconds in stats.frameDurations.items()),
+            "distinctProblems": len(groups),
+            "problems": [{"type": group.kind, "count": group.count, "firstTime": group.firstTime,
+                          "lastTime": group.lastTime, "message": group.key, "example": group.info.strip()}
+                         for group in groups.sortedGroups()[:problems]]}
+
+
+def summarize(results, problems=PROBLEMS):
+    """Will return the summary of every parsed .log file and their totals"""
+    files = dict((logFile, summarizeFile(nums, errors, warnings, problems))
+                 for logFile, (nums, errors, warnings) in results)
+    totals = {"files": len(files),
+              "lines": sum(summary["lines"] for summary in files.values()),
+              "errors": sum(summary["errors"] for summary in files.values()),
+              "warnings": sum(summary["warnings"] for summary in files.values()),
+              "totalTime": sum(summary["totalTime"] for summary in files.values()),
+              "peakMem": max([summary["peakMem"] for summary in files.values()] or [0])}
+    return {"totals": totals, "files": files}
+
+
+def parseArguments(arguments=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="+", help=".log files, directories or glob patterns")
+    parser.add_argument("-o", "--output", help="where to write the records, - for stdout")
+    parser.add_argument("-f", "--format", choices=FORMATS, help="records format, guessed from the output extension")
+    parser.add_argument("-s", "--summary", default="-", help="where to write the json summary, - for stdout")
+    parser.add_argument("-j", "--processes", type=int, default=None, help="worker processes, defaults to the cores")
+    parser.add_argument("-p", "--problems", type=int, default=PROBLEMS,
+                        help="most repeated errors/warnings kept in the summary of each file")
+    parser.add_argument("--fail-on-errors", action="store_true", help="exit with 1 when a log has ERROR lines")
+    return parser.parse_args(arguments)
+
+
+def main(arguments=None):
+    args = parseArguments(arguments)
+
+    logFiles = []
+    for source in args.sources:
+        logFiles.extend(logs.findLogFiles(source) if not os.path.isfile(source) else [source])
+    if not logFiles:
+        sys.stderr.write("No .log file found\n")
+        return 2
+
+    results = list(logs.parseLogJob(logFiles, args.processes).files.items())
+
+    if args.output:
+        outputFormat = args.format or os.path.splitext(args.output)[1].lstrip(".").lower()
+        if outputFormat not in FORMATS:
+            outputFormat = "jsonl"
+        if outputFormat == "parquet":
+            writeParquet(results, args.output)
+        else:
+            writer = writeCsv if outputFormat == "csv" else writeJsonLines
+            if args.output == "-":
+                writer(results, sys.stdout)
+            else:
+                with open(args.output, "w", newline="" if outputFormat == "csv" else None) as output:
+                    writer(results, output)
+
+    summary = summarize(results, args.problems)
+    if args.summary == "-":
+        # Records already went to stdout, the summary goes to stderr so both stay readable
+        stream = sys.stderr if args.output == "-" else sys.stdout
+        json.dump(summary, stream, indent=2)
+        stream.write("\n")
+    elif args.summary:
+        with open(args.summary, "w") as output:
+            json.dump(summary, output, indent=2)
+
+    if args.fail_on_errors and summary["totals"]["errors"]:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""SQLite database of parsed render logs, for trends across jobs
+
+    python logs_db.py renders.db ingest /renders/*/*.log
+    python logs_db.py renders.db peak-mem --percent 95
+    python logs_db.py renders.db slowest-frames --days 30
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import time
+from itertools import groupby
+
+from logs import DAY, FRAME_RE, Num, findLogFiles, iterLogRecords, memToBytes, summarizePhases, timeToSeconds
+from logs_groups import ProblemGroups
+from logs_stats import formatBytes, percentile
+
+SCHEMA_VERSION = 1
+INSERT_BATCH = 50000
+# The show is the directory after one of these in the path of a log, unless it is given. A log written right in the
+# shows directory has none
+SHOW_RE = re.compile("[\\\\/](?:shows?|projects?|proj|jobs?)[\\\\/]([^\\\\/]+)[\\\\/]", re.IGNORECASE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    show TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    renderedAt INTEGER NOT NULL,
+    lines INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    warnings INTEGER NOT NULL,
+    totalTime INTEGER NOT NULL,
+    peakMem INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS logsShowRenderedAt ON logs (show, renderedAt);
+CREATE INDEX IF NOT EXISTS logsRenderedAt ON logs (renderedAt);
+
+CREATE TABLE IF NOT EXISTS frames (
+    logId INTEGER NOT NULL REFERENCES logs (id) ON DELETE CASCADE,
+    frame TEXT NOT NULL,
+    duration INTEGER NOT NULL,
+    peakMem INTEGER NOT NULL,
+    meanMem REAL NOT NULL,
+    lines INTEGER NOT NULL,
+    warnings INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    PRIMARY KEY (logId, frame)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS problems (
+    logId INTEGER NOT NULL REFERENCES logs (id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    message TEXT NOT NULL,
+    example TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    firstTime TEXT NOT NULL,
+    lastTime TEXT NOT NULL,
+    PRIMARY KEY (logId, kind, message)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS problemsMessage ON problems (kind, message);
+
+-- A row per timed line. Clustered on (logId, row) with no other index, so rows of a new log are always appended at
+-- the end of the tree and ingestion keeps its speed however big the table gets
+CREATE TABLE IF NOT EXISTS samples (
+    logId INTEGER NOT NULL REFERENCES logs (id) ON DELETE CASCADE,
+    row INTEGER NOT NULL,
+    seconds INTEGER NOT NULL,
+    mem INTEGER NOT NULL,
+    warning INTEGER NOT NULL,
+    PRIMARY KEY (logId, row)
+) WITHOUT ROWID;
+"""
+
+
+def showOf(logFile):
+    """Will return the show of a .log file from its path, "" if it can't be found
+
+    :param logFile: .log file  -str
+    :return: str
+    """
+    match = SHOW_RE.search(os.path.abspath(logFile))
+    return match.group(1) if match else ""
+
+
+class RenderDatabase():
+    """Parsed render logs in SQLite. A log is streamed in one pass: its timed lines are inserted in batches while
+    its frames and problems are summarized, so memory stays flat whatever the size of the log. The database runs in
+    WAL mode so queries can be made while logs are ingested."""
+    def __init__(self, path, samples=True):
+        self.path = path
+        self.samples = samples
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA temp_store = MEMORY")
+        self.connection.execute("PRAGMA cache_size = -65536")
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise ValueError("{0} has schema version {1}, expected {2}".format(path, version, SCHEMA_VERSION))
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.execute("PRAGMA user_version = {0}".format(SCHEMA_VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def isIngested(self, logFile):
+        """Will tell if a .log file is in the database and was not modified since"""
+        stat = os.stat(logFile)
+        row = self.connection.execute("SELECT size, mtime FROM logs WHERE path = ?",
+                                      (os.path.abspath(logFile),)).fetchone()
+        return row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime
+
+    def ingest(self, logFile, show=None, phaseRe=FRAME_RE):
+        """Parse a .log file into the database, a modified file replaces its previous rows
+
+        :param logFile: .log file  -str
+        :param show: show of the render, found from the path when None  -str
+        :param phaseRe: regex naming the frames  -re.Pattern
+        :return: id of the log, None if it was already ingested  -int
+        """
+        if self.isIngested(logFile):
+            return None
+        path = os.path.abspath(logFile)
+        stat = os.stat(path)
+        show = showOf(path) if show is None else show
+
+        with self.connection:
+            self.connection.execute("DELETE FROM logs WHERE path = ?", (path,))
+            cursor = self.connection.execute(
+                "INSERT INTO logs (path, show, size, mtime, renderedAt, lines, errors, warnings, totalTime, peakMem) "
+                "VALUES (?, ?, ?, ?, ?, 0, 0, 0, 0, 0)",
+                (path, show, stat.st_size, stat.st_mtime, int(stat.st_mtime)))
+            logId = cursor.lastrowid
+
+            problems = ProblemGroups()
+            batch = []
+            phases = summarizePhases(self._tapRecords(iterLogRecords(path), logId, batch, problems), phaseRe)
+            self._insertSamples(batch)
+
+            self.connection.executemany(
+                "INSERT INTO frames VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((logId, str(phase.key), phase.duration, phase.peakMem, phase.meanMem, phase.lines, phase.warnings,
+                  phase.errors) for phase in phases.values()))
+            self.connection.executemany(
+                "INSERT INTO problems VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((logId, group.kind, group.key, group.info.strip(), group.count, group.firstTime, group.lastTime)
+                 for group in problems))
+            self.connection.execute(
+                "UPDATE logs SET lines = ?, errors = ?, warnings = ?, totalTime = ?, peakMem = ? WHERE id = ?",
+                (sum(phase.lines for phase in phases.values()), sum(phase.errors for phase in phases.values()),
+                 sum(phase.warnings for phase in phases.values()), sum(phase.duration for phase in phases.values()),
+                 max([phase.peakMem for phase in phases.values()] or [0]), logId))
+        return logId
+
+    def _tapRecords(self, records, logId, batch, problems):
+        """Will yield records unchanged, timed lines are inserted in batches and errors/warnings grouped on the way"""
+        seconds = {}
+        mems = {}
+        row = 0
+        for record in records:
+            if type(record) is Num:
+                if self.samples:
+                    recordSeconds = seconds.get(record.time)
+                    if recordSeconds is None:
+                        recordSeconds = seconds[record.time] = timeToSeconds(record.time)
+                    mem = mems.get(record.mem)
+                    if mem is None:
+                        mem = mems[record.mem] = memToBytes(record.mem)
+                    batch.append((logId, row, recordSeconds, mem, record.warning))
+                    row += 1
+                    if len(batch) >= INSERT_BATCH:
+                        self._insertSamples(batch)
+            else:
+                problems.add(record)
+            yield record
+
+    def _insertSamples(self, batch):
+        if batch:
+            self.connection.executemany("INSERT INTO samples VALUES (?, ?, ?, ?, ?)", batch)
+            del batch[:]
+
+    def ingestJob(self, source, show=None, phaseRe=FRAME_RE, progress=None):
+        """Ingest every .log file of a render job
+
+        :param source: directory, glob pattern or list of .log files  -str/list
+        :param show: show of the renders, found from the paths when None  -str
+        :param phaseRe: regex naming the frames  -re.Pattern
+        :param progress: called with each .log file, its id (None when skipped) and the seconds it took  -callable
+        :return: number of .log files ingested  -int
+        """
+        count = 0
+        for logFile in findLogFiles(source):
+            start = time.time()
+            logId = self.ingest(logFile, show, phaseRe)
+            count += logId is not None
+            if progress is not None:
+                progress(logFile, logId, time.time() - start)
+        return count
+
+    def peakMemPercentiles(self, percent=95, since=None, show=None):
+        """Will return a percentile of the peak mem of the logs for each show and week
+
+        :param percent: 0 to 100  -float
+        :param since: only logs rendered after this unix time  -int
+        :param show: only the logs of this show  -str
+        :return: [(show, week, peak mem, number of logs)]  -list of tuple
+        """
+        query = "SELECT show, strftime('%Y-W%W', renderedAt, 'unixepoch') AS week, peakMem FROM logs WHERE 1"
+        parameters = []
+        if since is not None:
+            query += " AND renderedAt >= ?"
+            parameters.append(since)
+        if show is not None:
+            query += " AND show = ?"
+            parameters.append(show)
+        query += " ORDER BY show, week, peakMem"
+
+        results = []
+        rows = self.connection.execute(query, parameters)
+        for (rowShow, week), group in groupby(rows, key=lambda row: (row[0], row[1])):
+            peaks = [row[2] for row in group]
+            results.append((rowShow, week, percentile(peaks, percent), len(peaks)))
+        return results
+
+    def slowestFrames(self, since=None, limit=20, show=None):
+        """Will return the frames that took the longest
+
+        :param since: only logs rendered after this unix time  -int
+        :param limit: number of frames  -int
+        :param show: only the frames of this show  -str
+        :return: [(path, show, frame, seconds, peak mem)]  -list of tuple
+        """
+        query = ("SELECT logs.path, logs.show, frames.frame, frames.duration, frames.peakMem FROM logs "
+                 "JOIN frames ON frames.logId = logs.id WHERE 1")
+        parameters = []
+        if since is not None:
+            query += " AND logs.renderedAt >= ?"
+            parameters.append(since)
+        if show is not None:
+            query += " AND logs.show = ?"
+            parameters.append(show)
+        query += " ORDER BY frames.duration DESC LIMIT ?"
+        parameters.append(limit)
+        return self.connection.execute(query, parameters).fetchall()
+
+    def memOverTime(self, logFile):
+        """Will return the time (seconds) and mem (bytes) of every timed line of an ingested log"""
+        return self.connection.execute(
+            "SELECT seconds, mem FROM samples WHERE logId = (SELECT id FROM logs WHERE path = ?) ORDER BY row",
+            (os.path.abspath(logFile),)).fetchall()
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("database", help="SQLite file, created if it doesn't exist")
+    commands = parser.add_subparsers(dest="command")
+    ingest = commands.add_parser("ingest", help="parse .log files into the database")
+    ingest.add_argument("sources", nargs="+", help=".log files, directories or glob patterns")
+    ingest.add_argument("--show", help="show of the renders, found from the paths by default")
+    ingest.add_argument("--no-samples", action="store_true", help="only keep frames and problems, not every line")
+    peakMem = commands.add_parser("peak-mem", help="percentile of peak mem per show per week")
+    peakMem.add_argument("--percent", type=float, default=95)
+    slowest = commands.add_parser("slowest-frames", help="frames that took the longest")
+    slowest.add_argument("--limit", type=int, default=20)
+    for command in (peakMem, slowest):
+        command.add_argument("--days", type=int, help="only the last days")
+        command.add_argument("--show", help="only this show")
+    args = parser.parse_args(arguments)
+    if args.command is None:
+        parser.error("a command is needed")
+
+    with RenderDatabase(args.database, samples=not getattr(args, "no_samples", False)) as database:
+        if args.command == "ingest":
+            def progress(logFile, logId, seconds):
+                print("{0} {1} {2:.2f}s".format("ingested" if logId is not None else "up to date", logFile, seconds))
+            total = 0
+            for source in args.sources:
+                total += database.ingestJob([source] if os.path.isfile(source) else source, args.show,
+                                            progress=progress)
+            print("{0} logs ingested".format(total))
+            return 0
+
+        since = int(time.time()) - args.days * DAY if args.days else None
+        if args.command == "peak-mem":
+            for show, week, peak, count in database.peakMemPercentiles(args.percent, since, args.show):
+                print("{0:<20} {1} p{2:g} {3:>10} ({4} logs)".format(show or "-", week, args.percent,
+                                                                   formatBytes(peak), count))
+        else:
+            for path, show, frame, seconds, peak in database.slowestFrames(since, args.limit, args.show):
+                print("{0:>8}s {1:>10} frame {2:<6} {3}".format(seconds, formatBytes(peak), frame, path))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
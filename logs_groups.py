@@ -0,0 +1,148 @@
+"""Group the repeated errors/warnings of parsed .log files into distinct problems"""
+import re
+from itertools import islice
+
+from logs import CHUNK_SIZE, COLUMNS_BATCH_SIZE, Error, Num, NumColumns, gcPaused, iterLogRecords
+
+# What changes between repeats of the same problem, replaced in this order
+ADDRESS_RE = re.compile("0x[0-9a-f]+", re.IGNORECASE)
+PATH_RE = re.compile("(?<![^\\s'\"(=])(?:[a-z]:)?[\\\\/][^\\s'\"),;]+", re.IGNORECASE)
+NUMBER_RE = re.compile("[0-9]+(?:\\.[0-9]+)?")
+SPACES_RE = re.compile("\\s+")
+KEY_CACHE_SIZE = 100000
+
+
+def normalizeMessage(info):
+    """Will return the info of an error/warning with its addresses, paths and numbers (frames, node indices...)
+    replaced, so the repeats of a problem all give the same message
+
+    :param info: info from a .log file's line  -str
+    :return: str
+    """
+    info = ADDRESS_RE.sub("<addr>", info)
+    info = PATH_RE.sub("<path>", info)
+    info = NUMBER_RE.sub("<n>", info)
+    return SPACES_RE.sub(" ", info).strip()
+
+
+class ProblemGroup():
+    """Contains how many times an error or warning was repeated, the first message as it was in the log and the
+    time of its first and last occurrence"""
+    def __init__(self, kind, key, info):
+        self.kind = kind
+        self.key = key
+        self.info = info
+        self.count = 0
+        self.firstTime = ""
+        self.lastTime = ""
+
+    def add(self, time):
+        self.count += 1
+        if time:
+            if not self.firstTime:
+                self.firstTime = time
+            self.lastTime = time
+
+    def __repr__(self):
+        return "ProblemGroup({0}, count={1}, {2!r})".format(self.kind, self.count, self.key)
+
+
+class ProblemGroups():
+    """Errors and warnings grouped by normalized message. Only a group is kept per distinct problem, so memory and
+    the number of rows to show grow with the problems of a render and not with the length of its log. Identical
+    messages are only normalized once."""
+    def __init__(self):
+        self.groups = {}
+        self._keys = {}
+
+    def __len__(self):
+        return len(self.groups)
+
+    def __iter__(self):
+        return iter(self.groups.values())
+
+    def add(self, record):
+        """Count an Error or Warning object in its group"""
+        kind = "error" if type(record) is Error else "warning"
+        info = record.info
+        key = self._keys.get(info)
+        if key is None:
+            if len(self._keys) >= KEY_CACHE_SIZE:
+                self._keys.clear()
+            key = self._keys[info] = normalizeMessage(info)
+        group = self.groups.get((kind, key))
+        if group is None:
+            group = self.groups[(kind, key)] = ProblemGroup(kind, key, info)
+        group.add(record.time)
+
+    def addRecords(self, errors, warnings):
+        """Count lists of Error and Warning objects"""
+        add = self.add
+        for record in errors:
+            add(record)
+        for record in warnings:
+            add(record)
+
+    def merge(self, other):
+        """Add the groups of another ProblemGroups that came after this one (next .log file or byte range)"""
+        for (kind, key), otherGroup in other.groups.items():
+            group = self.groups.get((kind, key))
+            if group is None:
+                group = self.groups[(kind, key)] = ProblemGroup(kind, key, otherGroup.info)
+                group.firstTime = otherGroup.firstTime
+            elif not group.firstTime:
+                group.firstTime = otherGroup.firstTime
+            group.count += otherGroup.count
+            group.lastTime = otherGroup.lastTime or group.lastTime
+
+    def sortedGroups(self, kind=None):
+        """Will return the groups, most repeated first
+
+        :param kind: "error" or "warning", None for both  -str
+        :return: list of ProblemGroup
+        """
+        groups = [group for group in self.groups.values() if kind is None or group.kind == kind]
+        groups.sort(key=lambda group: -group.count)
+        return groups
+
+    def errors(self):
+        return self.sortedGroups("error")
+
+    def warnings(self):
+        return self.sortedGroups("warning")
+
+
+def splitGroups(records):
+    """Will sort records into NumColumns and ProblemGroups, Error and Warning objects are only counted
+
+    :param records: Num, Error, Warning objects  -iterable
+    :return: nums, problems  -NumColumns, ProblemGroups
+    """
+    nums = NumColumns()
+    problems = ProblemGroups()
+    addProblem = problems.add
+    records = iter(records)
+
+    with gcPaused():
+        for batch in iter(lambda: list(islice(records, COLUMNS_BATCH_SIZE)), []):
+            batchNums = []
+            appendNum = batchNums.append
+            for record in batch:
+                if type(record) is Num:
+                    appendNum(record)
+                else:
+                    addProblem(record)
+            nums.appendNums(batchNums)
+
+    return nums, problems
+
+
+def parseLogFileGroups(logFile, chunkSize=CHUNK_SIZE):
+    """Will return NumColumns and the grouped errors/warnings of a .log file, without keeping an object per error or
+    warning line
+
+    :param logFile: .log file  -str
+    :param chunkSize: number of characters read at once  -int
+    :return: nums, problems  -NumColumns, ProblemGroups
+    """
+    return splitGroups(iterLogRecords(logFile, chunkSize))
@@ -0,0 +1,391 @@
+"""Search indexes over the records of a parsed .log file"""
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import accumulate, compress
+from operator import sub
+
+from logs import gcPaused, memToBytes, timeToSeconds
+from logs_stats import toColumns
+
+TOKEN_RE = re.compile("[a-z0-9_]+")
+KIND_RE = re.compile("^\\s*(nums?|lines?|warnings?|errors?)\\b", re.IGNORECASE)
+MEM_RE = re.compile("\\bmem\\s*(>=|<=|>|<|=)\\s*([0-9.]+\\s*[KMGT]?B?)\\b", re.IGNORECASE)
+TIME_RE = re.compile("\\b(?:between|from)\\s+(\\S+)\\s+(?:and|to)\\s+(\\S+)", re.IGNORECASE)
+KEYWORDS = set(["containing", "contains", "with", "where", "and"])
+KINDS = {"num": "nums", "nums": "nums", "line": "nums", "lines": "nums", "warning": "warnings",
+         "warnings": "warnings", "error": "errors", "errors": "errors"}
+BLOCK_SIZE = 4096
+_bitCount = getattr(int, "bit_count", None) or (lambda value: bin(value).count("1"))
+
+
+def tokenize(text):
+    """Will return the lower case words of a text
+
+    :param text: info from a .log file's line  -str
+    :return: words  -set of str
+    """
+    return set(TOKEN_RE.findall(text.lower()))
+
+
+class LazyRows():
+    """Rows in increasing order, only counted when searching. The rows of a block of BLOCK_SIZE rows are listed when
+    one of them is looked up, so a table only lists the blocks of the rows it shows."""
+    def __init__(self, count, rowCount, ends=None):
+        self.count = count
+        self.rowCount = rowCount
+        self.ends = ends
+        self.blocks = {}
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("rows index out of range")
+        if self.ends is None:
+            self.ends = list(accumulate(self.blockCounts()))
+        block = bisect_right(self.ends, index)
+        rows = self.blocks.get(block)
+        if rows is None:
+            rows = self.blocks[block] = self.blockRows(block)
+        return rows[index - self.ends[block - 1] if block else index]
+
+    def __iter__(self):
+        for block in range((self.rowCount + BLOCK_SIZE - 1) // BLOCK_SIZE):
+            for row in self.blocks.get(block) or self.blockRows(block):
+                yield row
+
+    def blockCounts(self):
+        """Will return how many rows are in each block"""
+        return []
+
+    def blockRows(self, block):
+        """Will return the rows of a block, in order"""
+        return []
+
+
+class BitmapRows(LazyRows):
+    """Rows of an int used as a bitmap, row i is in when bit i is set"""
+    def __init__(self, bits, rowCount):
+        super(BitmapRows, self).__init__(_bitCount(bits), rowCount)
+        self.bits = bits
+        self.data = bits.to_bytes((rowCount + 7) // 8, "little")
+
+    def __contains__(self, row):
+        return 0 <= row < self.rowCount and bool(self.data[row >> 3] & (1 << (row & 7)))
+
+    def blockCounts(self):
+        blockBytes = BLOCK_SIZE // 8
+        return [_bitCount(int.from_bytes(self.data[start:start + blockBytes], "little"))
+                for start in range(0, len(self.data), blockBytes)]
+
+    def blockRows(self, block):
+        start = block * BLOCK_SIZE
+        bits = int.from_bytes(self.data[start // 8:(start + BLOCK_SIZE) // 8], "little")
+        return list(compress(range(start, start + BLOCK_SIZE), map("1".__eq__, reversed(bin(bits)[2:]))))
+
+    def toBits(self):
+        return self.bits
+
+    def within(self, rows):
+        """Will return the rows that are also in a range of rows"""
+        if rows.stop <= rows.start:
+            return []
+        return BitmapRows(self.bits & (((1 << (rows.stop - rows.start)) - 1) << rows.start), self.rowCount)
+
+
+class ValueRows(LazyRows):
+    """Rows of a column with a value between low and high. Rows are sorted by value within each block, the rows of a
+    block between low and high are found by bisecting it and only put back in order when the block is looked up"""
+    def __init__(self, values, sortedValues, order, low, high, rows=None):
+        self.values = values
+        self.sortedValues = sortedValues
+        self.order = order
+        self.low = low
+        self.high = high
+        self.rows = rows
+        self.starts = []
+        self.stops = []
+        for start in range(0, len(order), BLOCK_SIZE):
+            end = min(start + BLOCK_SIZE, len(order))
+            if rows is not None and (end <= rows.start or start >= rows.stop):
+                self.starts.append(start)
+                self.stops.append(start)
+                continue
+            self.starts.append(bisect_left(sortedValues, low, start, end))
+            self.stops.append(max(bisect_right(sortedValues, high, start, end), self.starts[-1]))
+        counts = list(map(sub, self.stops, self.starts))
+        if rows is not None:
+            # only the blocks across the ends of the range have rows out of it
+            for block in set([rows.start // BLOCK_SIZE, (rows.stop - 1) // BLOCK_SIZE]):
+                if block < len(counts):
+                    counts[block] = sum(map(rows.__contains__, order[self.starts[block]:self.stops[block]]))
+        ends = list(accumulate(counts))
+        super(ValueRows, self).__init__(ends[-1] if ends else 0, len(order), ends)
+
+    def __contains__(self, row):
+        return (self.rows is None or row in self.rows) and self.low <= self.values[row] <= self.high
+
+    def blockRows(self, block):
+        rows = sorted(self.order[self.starts[block]:self.stops[block]])
+        if self.rows is not None:
+            rows = [row for row in rows if row in self.rows]
+        return rows
+
+    def toBits(self):
+        """Will return the rows as an int bitmap. Only the rows between the values, or the others when they are
+        fewer, are set one by one"""
+        inside = sum(map(sub, self.stops, self.starts)) * 2 < self.rowCount
+        digits = bytearray(b"0") * self.rowCount
+        for block, start in enumerate(range(0, self.rowCount, BLOCK_SIZE)):
+            if inside:
+                rows = self.order[self.starts[block]:self.stops[block]]
+            else:
+                rows = self.order[start:self.starts[block]] + self.order[self.stops[block]:start + BLOCK_SIZE]
+            for row in rows:
+                digits[row] = 49
+        bits = int(digits[::-1], 2) if self.rowCount else 0
+        if not inside:
+            bits ^= (1 << self.rowCount) - 1
+        if self.rows is not None:
+            bits &= ((1 << max(self.rows.stop - self.rows.start, 0)) - 1) << self.rows.start
+        return bits
+
+    def within(self, rows):
+        """Will return the rows that are also in a range of rows"""
+        if self.rows is not None:
+            rows = range(max(rows.start, self.rows.start), max(min(rows.stop, self.rows.stop), rows.start))
+        if rows.stop <= rows.start:
+            return []
+        return ValueRows(self.values, self.sortedValues, self.order, self.low, self.high, rows)
+
+
+class Query():
+    """Contains what to search in a LogIndex"""
+    def __init__(self, kind=None, words=(), timeRange=None, memRange=None):
+        self.kind = kind
+        self.words = list(words)
+        self.timeRange = timeRange
+        self.memRange = memRange
+
+    def isEmpty(self):
+        return not (self.kind or self.words or self.timeRange or self.memRange)
+
+
+def parseQuery(text):
+    """Parse a filter such as "warnings containing 'missing'", "lines between 02:00:00 and 02:10:00" or
+    "mem > 20G". Words that are not part of a time or mem condition have to be found in the info.
+
+    :param text: filter typed by the user  -str
+    :return: Query
+    """
+    query = Query()
+
+    match = KIND_RE.match(text)
+    if match:
+        query.kind = KINDS[match.group(1).lower()]
+        text = text[match.end():]
+
+    match = TIME_RE.search(text)
+    if match:
+        start, end = timeToSeconds(match.group(1)), timeToSeconds(match.group(2))
+        if start == -1 or end == -1:
+            raise ValueError("Times should be written HH:MM:SS")
+        query.timeRange = (start, end)
+        text = text[:match.start()] + text[match.end():]
+
+    for match in list(MEM_RE.finditer(text)):
+        operator, value = match.group(1), memToBytes(match.group(2))
+        if value == -1:
+            raise ValueError("Unknown mem: {0}".format(match.group(2)))
+        low, high = query.memRange or (0, float("inf"))
+        if operator == ">":
+            low = max(low, value + 1)
+        elif operator == ">=":
+            low = max(low, value)
+        elif operator == "<":
+            high = min(high, value - 1)
+        elif operator == "<=":
+            high = min(high, value)
+        else:
+            low, high = value, value
+        query.memRange = (low, high)
+    text = MEM_RE.sub(" ", text)
+
+    query.words = [word for word in TOKEN_RE.findall(text.lower()) if word not in KEYWORDS]
+    return query
+
+
+class LogIndex():
+    """Indexes built once per parse so filters don't rescan every record: an inverted index of the info words, Num
+    rows sorted by time and Num rows sorted by mem. The Num rows of each word are stored in order, as an array or as
+    a bitmap when that is smaller, and searches combine them lazily: they return rows in the order of the records
+    that are only listed when looked up.
+
+    On a million rows, a search by words, by time, by mem or by words and time takes less than a millisecond when its
+    rarest word is on a few thousand rows at most or every word is on more than 1/64 of the rows. Otherwise the rows
+    of the rarest condition are checked one by one, and a mem range with words or with unordered times is turned
+    into a bitmap row by row, a few milliseconds."""
+    def __init__(self, nums, errors, warnings):
+        self.nums = toColumns(nums)
+        self.errors = errors
+        self.warnings = warnings
+
+        with gcPaused():
+            self.infosByWord = self._wordIndex(self.nums.infoStrings)
+            self.rowsByWord = self._wordRows(self.nums.infoIds, self.infosByWord)
+
+            self.warningInfos = [warning.info for warning in warnings]
+            self.warningsByWord = self._wordIndex(self.warningInfos)
+            self.errorInfos = [error.info for error in errors]
+            self.errorsByWord = self._wordIndex(self.errorInfos)
+
+            # Time/mem, when rows are already in order (times usually are) the sorted index is a range of rows
+            self.sortedTimes, self.timeOrder = self._sortedIndex(self.nums.times)
+            self.sortedMems, self.memOrder = self._sortedIndex(self.nums.mems)
+
+    def _wordIndex(self, infos):
+        index = {}
+        for position, info in enumerate(infos):
+            for word in tokenize(info):
+                positions = index.get(word)
+                if positions is None:
+                    positions = index[word] = array("L")
+                positions.append(position)
+        return index
+
+    def _wordRows(self, infoIds, infosByWord):
+        """Will return the Num rows of each word, in order. Words on more than 1/64 of the rows are stored as a
+        bitmap, that is then smaller than an array of their rows"""
+        rowCount = len(infoIds)
+        counts = Counter(infoIds)
+        # rows of an info are infoRows[infoStarts[infoId]:infoStarts[infoId + 1]]
+        infoStarts = array("L", [0])
+        infoStarts.extend(accumulate(counts.get(infoId, 0) for infoId in range(len(self.nums.infoStrings))))
+        infoRows = array("L", sorted(range(rowCount), key=infoIds.__getitem__))
+
+        rowsByWord = {}
+        for word, wordInfos in infosByWord.items():
+            rows = array("L")
+            for infoId in wordInfos:
+                rows.extend(infoRows[infoStarts[infoId]:infoStarts[infoId + 1]])
+            if len(rows) * 64 > rowCount:
+                # the rows don't have to be sorted, they are set in the binary digits of the bitmap
+                digits = bytearray(b"0") * rowCount
+                for row in rows:
+                    digits[row] = 49
+                rowsByWord[word] = BitmapRows(int(digits[::-1], 2), rowCount)
+            else:
+                rowsByWord[word] = array("L", sorted(rows)) if len(wordInfos) > 1 else rows
+        return rowsByWord
+
+    def _sortedIndex(self, values):
+        """Will return the values sorted within each block of BLOCK_SIZE rows and the rows in that order, the values
+        and None when they already are in order"""
+        if all(map(int.__le__, values, values[1:])):
+            return values, None
+        order = array("L")
+        for start in range(0, len(values), BLOCK_SIZE):
+            order.extend(sorted(range(start, min(start + BLOCK_SIZE, len(values))), key=values.__getitem__))
+        return array(values.typecode, map(values.__getitem__, order)), order
+
+    def _valueRange(self, values, sortedValues, order, low, high):
+        if order is None:
+            return range(bisect_left(sortedValues, max(low, 0)), bisect_right(sortedValues, high))
+        return ValueRows(values, sortedValues, order, max(low, 0), high)
+
+    def _withWords(self, index, infos, words):
+        """Will return the positions whose info contains every word. Only the positions of the rarest word are
+        checked against the other words."""
+        postings = [index.get(word, ()) for word in words]
+        rarest = min(range(len(words)), key=lambda i: len(postings[i]))
+        if len(words) == 1:
+            return postings[rarest]
+        others = set(words)
+        return [position for position in postings[rarest] if others <= tokenize(infos[position])]
+
+    def numRowsWithWords(self, words):
+        """Will return the Num rows whose info contains every word, in order"""
+        postings = [self.rowsByWord.get(word, ()) for word in words]
+        bitmaps = [rows for rows in postings if isinstance(rows, BitmapRows)]
+        if len(bitmaps) > 1:
+            bits = bitmaps[0].bits
+            for rows in bitmaps[1:]:
+                bits &= rows.bits
+            bitmaps = [BitmapRows(bits, len(self.nums))]
+        postings = sorted([rows for rows in postings if not isinstance(rows, BitmapRows)], key=len) + bitmaps
+        rows = postings[0]
+        for otherRows in postings[1:]:
+            rows = self._intersect(rows, otherRows)
+        return rows
+
+    def numRowsInTime(self, start, end):
+        """Will return the Num rows between two times (seconds), in order"""
+        return self._valueRange(self.nums.times, self.sortedTimes, self.timeOrder, start, end)
+
+    def numRowsInMem(self, low, high):
+        """Will return the Num rows with a mem between low and high (bytes), in order"""
+        return self._valueRange(self.nums.mems, self.sortedMems, self.memOrder, low, high)
+
+    def search(self, query):
+        """Will return the rows matching a query for each kind of record, None when every row of that kind matches
+
+        :param query: what to search  -Query or str
+        :return: {"nums": rows, "warnings": rows, "errors": rows}  -dict
+        """
+        if not isinstance(query, Query):
+            query = parseQuery(query)
+        results = {"nums": None, "warnings": None, "errors": None}
+        if query.isEmpty():
+            return results
+
+        hasNumConditions = query.timeRange is not None or query.memRange is not None
+        for kind in results:
+            if query.kind is not None and kind != query.kind:
+                results[kind] = []
+            elif kind != "nums" and hasNumConditions:
+                results[kind] = []
+            elif kind == "nums":
+                results[kind] = self._searchNums(query)
+            elif query.words and kind == "warnings":
+                results[kind] = self._withWords(self.warningsByWord, self.warningInfos, query.words)
+            elif query.words:
+                results[kind] = self._withWords(self.errorsByWord, self.errorInfos, query.words)
+        return results
+
+    def _searchNums(self, query):
+        rows = None
+        if query.timeRange is not None:
+            rows = self.numRowsInTime(*query.timeRange)
+        if query.memRange is not None:
+            memRows = self.numRowsInMem(*query.memRange)
+            rows = memRows if rows is None else self._intersect(rows, memRows)
+        if query.words:
+            wordRows = self.numRowsWithWords(query.words)
+            rows = wordRows if rows is None else self._intersect(rows, wordRows)
+        return rows
+
+    def _intersect(self, rows, otherRows):
+        """Intersect two sorted rows. Ranges and bitmaps are intersected without listing their rows, otherwise the
+        rows of the shortest are checked against the other."""
+        if isinstance(otherRows, range):
+            rows, otherRows = otherRows, rows
+        if isinstance(rows, range):
+            if isinstance(otherRows, range):
+                return range(max(rows.start, otherRows.start), max(min(rows.stop, otherRows.stop),
+                                                                    max(rows.start, otherRows.start)))
+            if isinstance(otherRows, LazyRows):
+                return otherRows.within(rows)
+            return otherRows[bisect_left(otherRows, rows.start):bisect_left(otherRows, rows.stop)]
+        if isinstance(rows, LazyRows) and isinstance(otherRows, LazyRows) and (
+                min(len(rows), len(otherRows)) * 64 > len(self.nums)):
+            return BitmapRows(rows.toBits() & otherRows.toBits(), len(self.nums))
+        if len(otherRows) < len(rows):
+            rows, otherRows = otherRows, rows
+        if not isinstance(otherRows, LazyRows):
+            otherRows = set(otherRows)
+        return [row for row in rows if row in otherRows]
@@ -0,0 +1,299 @@
+"""Aggregate statistics over the time/mem of parsed .log files"""
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import accumulate, chain, compress, count, islice
+from operator import gt, mul, ne
+
+from logs import DAY, FRAME_RE, NumColumns
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class RenderStats():
+    """Contains the summary of a render log"""
+    def __init__(self):
+        self.samples = 0
+        self.totalTime = 0
+        self.frameDurations = {}
+        self.peakMem = 0
+        self.meanMem = 0.0
+        self.memPercentiles = {}
+        self.memGrowthRate = 0.0
+
+    def __repr__(self):
+        return "RenderStats(totalTime={0}, peakMem={1}, meanMem={2:.0f}, frames={3})".format(
+            self.totalTime, formatBytes(self.peakMem), self.meanMem, len(self.frameDurations))
+
+
+def toColumns(nums):
+    """Will return nums as NumColumns, decoding time and mem of Num objects in one pass
+
+    :param nums: Num objects or NumColumns  -iterable
+    :return: NumColumns
+    """
+    if isinstance(nums, NumColumns):
+        return nums
+    columns = NumColumns()
+    columns.extend(nums)
+    return columns
+
+
+def validPairs(times, mems):
+    """Will return times and mems of the rows where both are valid
+
+    :param times: seconds  -array
+    :param mems: bytes  -array
+    :return: times, mems  -array, array
+    """
+    if -1 not in times and -1 not in mems:
+        return times, mems
+    keep = list(map((0).__le__, map(min, times, mems)))
+    return array("l", compress(times, keep)), array("q", compress(mems, keep))
+
+
+def unwrapTimes(times):
+    """Log times roll over at midnight, will return times that keep increasing. A rollover is a drop of more than
+    half a day from a row to the next, they are found and shifted by builtins instead of a loop over the rows.
+
+    :param times: seconds  -array
+    :return: seconds  -array
+    """
+    # times rarely go back, only the rows where they do are checked for a drop of more than half a day
+    rollovers = [row for row in compress(count(1), map(gt, times, islice(times, 1, None)))
+                 if times[row - 1] - times[row] > DAY // 2]
+    if not rollovers:
+        return times
+    # the rows before the first rollover are copied as they are
+    unwrapped = times[:rollovers[0]]
+    bounds = rollovers + [len(times)]
+    for day, (start, end) in enumerate(zip(bounds, bounds[1:]), 1):
+        unwrapped.extend(map((day * DAY).__add__, times[start:end]))
+    return unwrapped
+
+
+def percentile(sortedValues, percent):
+    """Will return the percentile of already sorted values with linear interpolation
+
+    :param sortedValues: sorted values  -sequence
+    :param percent: 0 to 100  -float
+    :return: float
+    """
+    if not sortedValues:
+        return 0.0
+    position = (len(sortedValues) - 1) * percent / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sortedValues) - 1)
+    return sortedValues[lower] + (sortedValues[upper] - sortedValues[lower]) * (position - lower)
+
+
+def memHistogram(columns, mems):
+    """Will return the distinct valid mems in increasing order and how many rows have a mem up to each of them.
+    When every row is valid, the rows are counted by interned mem id and only the distinct mems are converted.
+
+    :param columns: parsed time/mem  -NumColumns
+    :param mems: bytes of the valid rows, columns.mems if they all are  -array
+    :return: values, cumulative counts  -list, list
+    """
+    if mems is columns.mems:
+        counts = Counter()
+        for memId, rows in Counter(columns.memIds).items():
+            counts[columns.memBytesOf(memId)] += rows
+    else:
+        counts = Counter(mems)
+    values = sorted(counts)
+    return values, list(accumulate(map(counts.__getitem__, values)))
+
+
+def countedPercentile(values, ends, percent):
+    """Will return the same as percentile() over values repeated as many times as they are counted
+
+    :param values: distinct sorted values  -sequence
+    :param ends: cumulative counts of values  -sequence of int
+    :param percent: 0 to 100  -float
+    :return: float
+    """
+    if not values:
+        return 0.0
+    position = (ends[-1] - 1) * percent / 100.0
+    lower = int(position)
+    upper = min(lower + 1, ends[-1] - 1)
+    lowerValue = values[bisect_right(ends, lower)]
+    upperValue = values[bisect_right(ends, upper)]
+    return lowerValue + (upperValue - lowerValue) * (position - lower)
+
+
+def growthRate(times, mems):
+    """Will return the least squares slope of mem over time
+
+    :param times: seconds  -array
+    :param mems: bytes  -array
+    :return: bytes per second  -float
+    """
+    rows = len(times)
+    if rows < 2:
+        return 0.0
+    # many rows share a time, the sums over times are made over the distinct ones
+    timeCounts = Counter(times)
+    sumT = sum(map(mul, timeCounts, timeCounts.values()))
+    sumTT = sum([t * t * c for t, c in timeCounts.items()])
+    sumM = sum(mems)
+    sumTM = sum(map(mul, times, mems))
+    denominator = rows * sumTT - sumT * sumT
+    if denominator == 0:
+        return 0.0
+    return float(rows * sumTM - sumT * sumM) / denominator
+
+
+def frameDurations(columns, times, frameRe=FRAME_RE):
+    """Will return how long each frame took. A frame starts at the first line whose info matches frameRe and ends
+    where the next frame starts.
+
+    :param columns: parsed time/mem  -NumColumns
+    :param times: unwrapped seconds of every row, negative only before the first valid time  -array
+    :param frameRe: regex capturing the frame number  -re.Pattern
+    :return: {frame: seconds}  -dict
+    """
+    # the frame of each interned info (-1 if it has none), the regex only runs once per distinct info
+    frameOfInfo = []
+    for info in columns.infoStrings:
+        match = frameRe.search(info)
+        frameOfInfo.append(int(match.group(1)) if match else -1)
+    if not frameOfInfo or max(frameOfInfo) == -1:
+        return {}
+
+    # the frame of each row, then the rows where it changes, mapped by builtins instead of a loop over the rows
+    frames = list(map(frameOfInfo.__getitem__, columns.infoIds))
+    # only the first rows can be without a time, the ones before the first valid time of the log
+    invalid = 0
+    while invalid < len(times) and times[invalid] < 0:
+        invalid += 1
+    frames[:invalid] = [-1] * invalid
+    if -1 in frames:
+        hasFrame = list(map((-1).__ne__, frames))
+        rows = list(compress(count(), hasFrame))
+        frames = list(compress(frames, hasFrame))
+    else:
+        rows = range(len(frames))
+    changes = compress(count(), chain((True,), map(ne, frames, islice(frames, 1, None))))
+    starts = [(rows[i], frames[i]) for i in changes] if frames else []
+
+    durations = {}
+    ends = [row for row, frame in starts[1:]] + [len(times) - 1]
+    for (start, frame), end in zip(starts, ends):
+        durations[frame] = durations.get(frame, 0) + max(times[end] - times[start], 0)
+    return durations
+
+
+def summarize(nums, percentiles=PERCENTILES, frameRe=FRAME_RE):
+    """Will return total render time, frame durations, peak/mean/percentile mem and mem growth rate
+
+    :param nums: Num objects or NumColumns  -iterable
+    :param percentiles: mem percentiles to compute  -tuple of float
+    :param frameRe: regex capturing the frame number from a line's info  -re.Pattern
+    :return: RenderStats
+    """
+    columns = toColumns(nums)
+    stats = RenderStats()
+
+    times, mems = validPairs(columns.times, columns.mems)
+    stats.samples = len(times)
+    if not times:
+        return stats
+
+    unwrapped = unwrapTimes(times)
+    stats.totalTime = unwrapped[-1] - unwrapped[0]
+    memValues, memEnds = memHistogram(columns, mems)
+    stats.peakMem = memValues[-1]
+    stats.meanMem = float(sum(mems)) / len(mems)
+    stats.memPercentiles = dict((p, countedPercentile(memValues, memEnds, p)) for p in percentiles)
+    # the slope doesn't depend on where times start, the sums are exact integers
+    stats.memGrowthRate = growthRate(unwrapped, mems)
+
+    if times is columns.times:
+        # no row was left out, frames are measured with the same unwrapped times
+        stats.frameDurations = frameDurations(columns, unwrapped, frameRe)
+    elif -1 in columns.times:
+        # rows without a valid time take the time of the row before, only those rows are looped over
+        allTimes = array("l", columns.times)
+        row = allTimes.index(-1)
+        try:
+            while True:
+                if row:
+                    allTimes[row] = allTimes[row - 1]
+                row = allTimes.index(-1, row + 1)
+        except ValueError:
+            pass
+        stats.frameDurations = frameDurations(columns, unwrapTimes(allTimes), frameRe)
+    else:
+        stats.frameDurations = frameDurations(columns, unwrapTimes(columns.times), frameRe)
+
+    return stats
+
+
+def formatBytes(value):
+    """Will return a number of bytes the way .log files write them (115MB, 1.20GB...)
+
+    :param value: bytes  -int
+    :return: str
+    """
+    for unit, size in (("TB", 1024 ** 4), ("GB", 1024 ** 3), ("MB", 1024 ** 2), ("KB", 1024)):
+        if abs(value) >= size:
+            return "{0:.2f}{1}".format(float(value) / size, unit)
+    return "{0}B".format(int(value))
+
+
+class MinMaxPyramid():
+    """Min/max downsampling pyramid of mem over time. Level 0 holds every sample, each level above keeps the min and
+    max mem of pairs of buckets of the level below. A view of any time range is drawn from the level where it holds
+    about as many buckets as there are pixels, so the painter never gets every sample."""
+    def __init__(self, nums):
+        columns = toColumns(nums)
+        times, mems = validPairs(columns.times, columns.mems)
+        self.times = unwrapTimes(times)
+        self.levels = [(mems, mems)]
+        mins, maxs = mems, mems
+        while len(mins) > 1:
+            if len(mins) % 2:
+                mins = mins + mins[-1:]
+                maxs = maxs + maxs[-1:]
+            mins = array("q", map(min, mins[0::2], mins[1::2]))
+            maxs = array("q", map(max, maxs[0::2], maxs[1::2]))
+            self.levels.append((mins, maxs))
+
+    def __len__(self):
+        return len(self.times)
+
+    def timeRange(self):
+        """Will return the first and last time (seconds)"""
+        if not self.times:
+            return 0, 0
+        return self.times[0], self.times[-1]
+
+    def memRange(self):
+        """Will return the lowest and highest mem (bytes)"""
+        if not self.times:
+            return 0, 0
+        mins, maxs = self.levels[-1]
+        return mins[0], maxs[0]
+
+    def query(self, start, end, buckets):
+        """Will return the downsampled samples between two times
+
+        :param start: first time (seconds)  -float
+        :param end: last time (seconds)  -float
+        :param buckets: number of buckets wanted, usually the width in pixels  -int
+        :return: [(time, min mem, max mem)]  -list of tuple
+        """
+        first = max(bisect_left(self.times, start) - 1, 0)
+        last = min(bisect_right(self.times, end) + 1, len(self.times))
+        if last <= first:
+            return []
+
+        level = 0
+        while level + 1 < len(self.levels) and (last - first) >> level > 2 * max(buckets, 1):
+            level += 1
+        mins, maxs = self.levels[level]
+        size = 1 << level
+        return [(self.times[bucket * size], mins[bucket], maxs[bucket])
+                for bucket in range(first >> level, ((last - 1) >> level) + 1)]
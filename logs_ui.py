@@ -1,11 +1,555 @@
-from PySide2 import QtWidgets
-from logs import *
+from PySide2 import QtWidgets, QtCore, QtGui
+from itertools import islice
+from logs import FRAME_RE, LogFollower, NumColumns, compareLogs, compressionOf, isLogFile, secondsToTime, splitColumns
+import logs_cache
+import logs_groups
+import logs_stats
 import os
 
+FETCH_SIZE = 1000
+
+
+class LazyTableModel(QtCore.QAbstractTableModel):
+    """Table model over parsed records, rows are given to the view FETCH_SIZE at a time as it scrolls. A row filter
+    limits the model to some records"""
+    headers = []
+
+    def __init__(self, parent=None):
+        super(LazyTableModel, self).__init__(parent)
+        self.loaded = 0
+        self.rows = None
+
+    def totalCount(self):
+        return 0
+
+    def recordCount(self):
+        if self.rows is not None:
+            return len(self.rows)
+        return self.totalCount()
+
+    def setRowFilter(self, rows):
+        """Only show some records
+
+        :param rows: records to show, None to show all of them  -sequence of int
+        """
+        self.beginResetModel()
+        self.rows = rows
+        self.resetLoaded()
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return self.headers[section]
+        return None
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return not parent.isValid() and self.loaded < self.recordCount()
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        count = min(FETCH_SIZE, self.recordCount() - self.loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    def resetLoaded(self):
+        self.loaded = min(FETCH_SIZE, self.recordCount())
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole or not index.isValid():
+            return None
+        row = index.row()
+        if self.rows is not None:
+            row = self.rows[row]
+        return self.cellText(row, index.column())
+
+    def cellText(self, row, column):
+        return ""
+
+
+class NumTableModel(LazyTableModel):
+    """Time/Mem/Warning/Info of Num objects or NumColumns"""
+    headers = ["Time", "Mem", "WARNING", "Info"]
+
+    def __init__(self, parent=None):
+        super(NumTableModel, self).__init__(parent)
+        self.nums = []
+        self.provisional = None
+
+    def totalCount(self):
+        return len(self.nums) + (self.provisional is not None)
+
+    def setRecords(self, nums):
+        self.beginResetModel()
+        self.nums = nums
+        self.provisional = None
+        self.rows = None
+        self.resetLoaded()
+        self.endResetModel()
+
+    def recordsAppended(self, previousCount):
+        """To call once records were added at the end of self.nums, rows are shown right away if the view already
+        fetched everything"""
+        if self.rows is not None:
+            return
+        if self.loaded == previousCount and self.recordCount() > previousCount:
+            self.fetchMore()
+
+    def setProvisional(self, num):
+        """Show a Num after the records until it is parsed for good, set it to None before records are appended
+
+        :param num: last line of a followed file, None to remove it  -Num
+        """
+        if self.provisional is not None and self.loaded > len(self.nums):
+            self.beginRemoveRows(QtCore.QModelIndex(), self.loaded - 1, self.loaded - 1)
+            self.provisional = None
+            self.loaded -= 1
+            self.endRemoveRows()
+        self.provisional = num
+        if num is not None:
+            self.recordsAppended(len(self.nums))
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.ForegroundRole and index.isValid():
+            if self.rows is None and index.row() == len(self.nums):
+                return QtGui.QBrush(QtGui.QColor(130, 130, 130))
+            return None
+        return super(NumTableModel, self).data(index, role)
+
+    def cellText(self, row, column):
+        num = self.provisional if row == len(self.nums) else self.nums[row]
+        if column == 0:
+            return num.time
+        elif column == 1:
+            return num.mem
+        elif column == 2:
+            return "WARNING" if num.warning else ""
+        return num.info.rstrip("\n")
+
+
+class WarningErrorTableModel(LazyTableModel):
+    """Warnings followed by errors"""
+    headers = ["Type", "Info"]
+
+    def __init__(self, parent=None):
+        super(WarningErrorTableModel, self).__init__(parent)
+        self.warnings = []
+        self.errors = []
+
+    def totalCount(self):
+        return len(self.warnings) + len(self.errors)
+
+    def setRecords(self, errors, warnings):
+        self.beginResetModel()
+        self.errors = errors
+        self.warnings = warnings
+        self.rows = None
+        self.resetLoaded()
+        self.endResetModel()
+
+    def recordsAppended(self, previousWarnings, previousErrors):
+        """To call once records were added at the end of self.warnings and self.errors. New warnings are inserted
+        above the errors when the view already shows rows past them"""
+        if self.rows is not None:
+            return
+        fullyLoaded = self.loaded == previousWarnings + previousErrors
+        newWarnings = len(self.warnings) - previousWarnings
+        if newWarnings and self.loaded > previousWarnings:
+            self.beginInsertRows(QtCore.QModelIndex(), previousWarnings, previousWarnings + newWarnings - 1)
+            self.loaded += newWarnings
+            self.endInsertRows()
+        if fullyLoaded:
+            self.fetchMore()
+
+    def cellText(self, row, column):
+        if row < len(self.warnings):
+            kind, record = "WARNING", self.warnings[row]
+        else:
+            kind, record = "ERROR", self.errors[row - len(self.warnings)]
+        if column == 0:
+            return kind
+        return record.info.rstrip("\n")
+
+
+class ProblemGroupTableModel(LazyTableModel):
+    """Repeated warnings/errors grouped by normalized message, most repeated first"""
+    headers = ["Type", "Count", "First", "Last", "Info"]
+
+    def __init__(self, parent=None):
+        super(ProblemGroupTableModel, self).__init__(parent)
+        self.groups = []
+
+    def totalCount(self):
+        return len(self.groups)
+
+    def setGroups(self, groups):
+        self.beginResetModel()
+        self.groups = groups
+        self.resetLoaded()
+        self.endResetModel()
+
+    def cellText(self, row, column):
+        group = self.groups[row]
+        if column == 0:
+            return group.kind.upper()
+        elif column == 1:
+            return str(group.count)
+        elif column == 2:
+            return group.firstTime
+        elif column == 3:
+            return group.lastTime
+        return group.info.rstrip("\n")
+
+
+class ParseWorker(QtCore.QObject):
+    """Parse a .log file outside of the GUI thread, records are sent back in batches. Given a follower, the file is
+    read through it instead of the cache so it can keep polling from where the parse stopped."""
+    batchReady = QtCore.Signal(object, object, object)
+    progress = QtCore.Signal(int)
+    finished = QtCore.Signal(bool, str)
+
+    def __init__(self, logFile, follower=None):
+        super(ParseWorker, self).__init__()
+        self.logFile = logFile
+        self.follower = follower
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def report_progress(self, offset, size):
+        self.progress.emit(int(100 * float(offset) / size) if size else 100)
+
+    def iter_follower_batches(self):
+        records = self.follower.iterPoll()
+        while True:
+            nums, errors, warnings = splitColumns(islice(records, logs_cache.BATCH_SIZE))
+            if not (len(nums) or errors or warnings):
+                return
+            self.report_progress(self.follower.offset, self.follower.lastStat[0])
+            yield nums, errors, warnings
+
+    def run(self):
+        if self.follower is not None:
+            batches = self.iter_follower_batches()
+        else:
+            batches = logs_cache.LogCache().iterParse(self.logFile, progress=self.report_progress)
+        completed = False
+        error = ""
+        try:
+            for nums, errors, warnings in batches:
+                if self.cancelled:
+                    break
+                self.batchReady.emit(nums, errors, warnings)
+            else:
+                completed = True
+        except Exception as exception:
+            error = "Can't read {0}: {1}".format(self.logFile, exception)
+        finally:
+            self.finished.emit(completed, error)
+
+
+class MemoryChart(QtWidgets.QWidget):
+    """Mem over time chart, drawn from a min/max pyramid so a redraw only paints about two points per pixel.
+    Mouse wheel zooms around the cursor, dragging pans."""
+
+    def __init__(self, parent=None):
+        super(MemoryChart, self).__init__(parent)
+        self.setMinimumHeight(150)
+        self.pyramid = None
+        self.view = (0.0, 1.0)
+        self.drag_start = None
+
+    def set_pyramid(self, pyramid):
+        self.pyramid = pyramid
+        start, end = pyramid.timeRange() if pyramid is not None else (0, 1)
+        self.view = (float(start), float(max(end, start + 1)))
+        self.update()
+
+    def clamp_view(self, start, end):
+        """Keep the view inside the times of the chart"""
+        first, last = self.pyramid.timeRange()
+        last = max(last, first + 1)
+        span = min(end - start, last - first)
+        start = min(max(start, first), last - span)
+        return start, start + span
+
+    def wheelEvent(self, event):
+        if self.pyramid is None or not len(self.pyramid):
+            return
+        start, end = self.view
+        factor = 0.8 if event.angleDelta().y() > 0 else 1.25
+        anchor = start + (end - start) * event.pos().x() / float(max(self.width(), 1))
+        span = max((end - start) * factor, 1.0)
+        ratio = (anchor - start) / (end - start)
+        self.view = self.clamp_view(anchor - span * ratio, anchor - span * ratio + span)
+        self.update()
+
+    def mousePressEvent(self, event):
+        self.drag_start = (event.pos().x(), self.view)
+
+    def mouseMoveEvent(self, event):
+        if self.drag_start is None or self.pyramid is None or not len(self.pyramid):
+            return
+        x, (start, end) = self.drag_start
+        shift = (x - event.pos().x()) * (end - start) / float(max(self.width(), 1))
+        self.view = self.clamp_view(start + shift, end + shift)
+        self.update()
+
+    def mouseReleaseEvent(self, event):
+        self.drag_start = None
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.fillRect(self.rect(), QtGui.QColor("#101010"))
+        if self.pyramid is None or not len(self.pyramid):
+            return
+
+        width, height = self.width(), self.height() - 20
+        start, end = self.view
+        low, high = self.pyramid.memRange()
+        memSpan = float(max(high - low, 1))
+        timeSpan = float(end - start)
+
+        points = []
+        for time, memMin, memMax in self.pyramid.query(start, end, width):
+            x = (time - start) / timeSpan * width
+            points.append(QtCore.QPointF(x, height - (memMin - low) / memSpan * height))
+            if memMax != memMin:
+                points.append(QtCore.QPointF(x, height - (memMax - low) / memSpan * height))
+        painter.setPen(QtGui.QColor("#4fa3e0"))
+        painter.drawPolyline(QtGui.QPolygonF(points))
+
+        painter.setPen(QtGui.QColor("#c0c0c0"))
+        painter.drawText(4, 14, logs_stats.formatBytes(high))
+        painter.drawText(4, height + 16, secondsToTime(int(start) % 86400))
+        endLabel = secondsToTime(int(end) % 86400)
+        painter.drawText(width - painter.fontMetrics().width(endLabel) - 4, height + 16, endLabel)
+
+
+class SummaryWorker(QtCore.QObject):
+    """Compute the summary and the memory chart of parsed records outside of the GUI thread"""
+    summaryReady = QtCore.Signal(object, object)
+
+    def __init__(self, nums):
+        super(SummaryWorker, self).__init__()
+        self.nums = nums
+
+    def run(self):
+        self.summaryReady.emit(logs_stats.MinMaxPyramid(self.nums), logs_stats.summarize(self.nums))
+
+
+class IndexWorker(QtCore.QObject):
+    """Build the search index of parsed records outside of the GUI thread"""
+    indexReady = QtCore.Signal(object)
+
+    def __init__(self, nums, errors, warnings):
+        super(IndexWorker, self).__init__()
+        self.records = (nums, errors, warnings)
+
+    def run(self):
+        # The search index is only imported once a file was parsed
+        import logs_index
+        self.indexReady.emit(logs_index.LogIndex(*self.records))
+
+
+class CompareWorker(QtCore.QObject):
+    """Compare .log files outside of the GUI thread"""
+    finished = QtCore.Signal(object, str)
+
+    def __init__(self, logFiles, phaseRe):
+        super(CompareWorker, self).__init__()
+        self.logFiles = logFiles
+        self.phaseRe = phaseRe
+
+    def run(self):
+        # A single process, forking a pool from a thread of a Qt application is not safe
+        try:
+            self.finished.emit(compareLogs(self.logFiles, self.phaseRe, processes=1), "")
+        except Exception as error:
+            self.finished.emit(None, str(error))
+
+
+class ComparisonTableModel(LazyTableModel):
+    """Time and peak MEM of each phase in each log, the logs after the first also show their delta to the first.
+    The first row adds up every phase."""
+
+    def __init__(self, parent=None):
+        super(ComparisonTableModel, self).__init__(parent)
+        self.comparison = None
+        self.headers = []
+        self.columns = []
+
+    def totalCount(self):
+        return len(self.comparison) + 1 if self.comparison is not None else 0
+
+    def setComparison(self, comparison):
+        self.beginResetModel()
+        self.comparison = comparison
+        self.headers = ["Phase"]
+        self.columns = [(None, None)]
+        for i, logFile in enumerate(comparison.logFiles if comparison is not None else []):
+            name = os.path.basename(logFile)
+            fields = ["time", "peak"] if i == 0 else ["time", "deltaTime", "peak", "deltaPeak"]
+            for field in fields:
+                self.columns.append((i, field))
+                self.headers.append({"time": "Time ", "peak": "Peak MEM ", "deltaTime": "+/- Time ",
+                                     "deltaPeak": "+/- MEM "}[field] + name)
+        self.rows = None
+        self.resetLoaded()
+        self.endResetModel()
+
+    def summaries(self, row):
+        if row == 0:
+            return self.comparison.totals()
+        return self.comparison.row(self.comparison.keys[row - 1])
+
+    def delta(self, row, column):
+        """Will return the difference to the first log of a delta cell, None for other cells"""
+        logIndex, field = self.columns[column]
+        if field not in ("deltaTime", "deltaPeak"):
+            return None
+        summaries = self.summaries(row)
+        if summaries[0] is None or summaries[logIndex] is None:
+            return None
+        if field == "deltaTime":
+            return summaries[logIndex].duration - summaries[0].duration
+        return summaries[logIndex].peakMem - summaries[0].peakMem
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.ForegroundRole and index.isValid():
+            delta = self.delta(index.row(), index.column())
+            if delta:
+                return QtGui.QBrush(QtGui.QColor(200, 40, 40) if delta > 0 else QtGui.QColor(40, 150, 40))
+            return None
+        return super(ComparisonTableModel, self).data(index, role)
+
+    def cellText(self, row, column):
+        logIndex, field = self.columns[column]
+        if field is None:
+            return "Total" if row == 0 else str(self.comparison.keys[row - 1])
+        summary = self.summaries(row)[logIndex]
+        if summary is None:
+            return ""
+        if field == "time":
+            return secondsToTime(summary.duration)
+        elif field == "peak":
+            return logs_stats.formatBytes(summary.peakMem)
+        delta = self.delta(row, column)
+        if delta is None:
+            return ""
+        sign = "+" if delta > 0 else "-" if delta < 0 else ""
+        if field == "deltaTime":
+            return sign + secondsToTime(abs(delta))
+        return sign + logs_stats.formatBytes(abs(delta))
+
+
+class CompareWidget(QtWidgets.QWidget):
+    """Diff view of two or more .log files, phases (frames by default) are aligned and the time and peak MEM of each
+    log is compared to the first one"""
+
+    def __init__(self, logFiles=()):
+        super(CompareWidget, self).__init__()
+        self.setWindowTitle("Compare logs")
+        self.resize(900, 500)
+        self.compare_thread = None
+        self.compare_worker = None
+
+        self.mainLayout = QtWidgets.QVBoxLayout()
+        self.setLayout(self.mainLayout)
+
+        self.filesLayout = QtWidgets.QHBoxLayout()
+        self.file_list = QtWidgets.QListWidget()
+        self.file_list.setMaximumHeight(90)
+        self.file_list.addItems([logFile for logFile in logFiles if logFile])
+        self.filesButtonsLayout = QtWidgets.QVBoxLayout()
+        self.add_button = QtWidgets.QPushButton("Add")
+        self.add_button.clicked.connect(self.add_files)
+        self.remove_button = QtWidgets.QPushButton("Remove")
+        self.remove_button.clicked.connect(self.remove_files)
+        self.filesButtonsLayout.addWidget(self.add_button)
+        self.filesButtonsLayout.addWidget(self.remove_button)
+        self.filesLayout.addWidget(self.file_list)
+        self.filesLayout.addLayout(self.filesButtonsLayout)
+        self.mainLayout.addLayout(self.filesLayout)
+
+        self.phaseLayout = QtWidgets.QHBoxLayout()
+        self.phase_text = QtWidgets.QLineEdit(FRAME_RE.pattern)
+        self.phase_text.setToolTip("Regex starting a phase in the info, its first group names the phase")
+        self.compare_button = QtWidgets.QPushButton("Compare")
+        self.compare_button.clicked.connect(self.start_compare)
+        self.phaseLayout.addWidget(QtWidgets.QLabel("Phase"))
+        self.phaseLayout.addWidget(self.phase_text)
+        self.phaseLayout.addWidget(self.compare_button)
+        self.mainLayout.addLayout(self.phaseLayout)
+
+        self.status_label = QtWidgets.QLabel("")
+        self.mainLayout.addWidget(self.status_label)
+
+        self.comparisonModel = ComparisonTableModel(self)
+        self.comparisonView = QtWidgets.QTableView()
+        self.comparisonView.setModel(self.comparisonModel)
+        self.comparisonView.verticalHeader().setVisible(False)
+        self.mainLayout.addWidget(self.comparisonView)
+
+    def log_files(self):
+        return [self.file_list.item(i).text() for i in range(self.file_list.count())]
+
+    def add_files(self):
+        files = QtWidgets.QFileDialog.getOpenFileNames(self, "Add .log files", "", "Logs (*.log);;All files (*)")
+        self.file_list.addItems(files[0])
+
+    def remove_files(self):
+        for item in self.file_list.selectedItems():
+            self.file_list.takeItem(self.file_list.row(item))
+
+    def start_compare(self):
+        logFiles = self.log_files()
+        if len(logFiles) < 2:
+            self.status_label.setText("Add at least two .log files")
+            return
+        missing = [logFile for logFile in logFiles if not os.path.isfile(logFile)]
+        if missing:
+            self.status_label.setText("Missing: " + ", ".join(missing))
+            return
+
+        self.compare_thread = QtCore.QThread(self)
+        self.compare_worker = CompareWorker(logFiles, self.phase_text.text())
+        self.compare_worker.moveToThread(self.compare_thread)
+        self.compare_thread.started.connect(self.compare_worker.run)
+        self.compare_worker.finished.connect(self.compare_finished)
+        self.compare_worker.finished.connect(self.compare_thread.quit)
+        self.compare_button.setEnabled(False)
+        self.status_label.setText("Comparing...")
+        self.compare_thread.start()
+
+    def compare_finished(self, comparison, error):
+        if self.sender() is not self.compare_worker:
+            return
+        self.compare_button.setEnabled(True)
+        if comparison is None:
+            self.status_label.setText(error)
+            return
+        self.status_label.setText("{0} phases".format(len(comparison)))
+        self.comparisonModel.setComparison(comparison)
+
+    def closeEvent(self, event):
+        if self.compare_thread is not None:
+            self.compare_thread.quit()
+            self.compare_thread.wait()
+        super(CompareWidget, self).closeEvent(event)
+
 
 class MainWidget(QtWidgets.QWidget):
     """User enter or browse for a .log file, information will be display inside
-    QTableWidgets as QLabels"""
+    QTableViews, rows are only created as they are scrolled to"""
 
     def __init__(self):
         super(MainWidget, self).__init__()
@@ -21,6 +565,19 @@ class MainWidget(QtWidgets.QWidget):
         self.nums = []
         self.errors = []
         self.warnings = []
+        self.problems = logs_groups.ProblemGroups()
+        self.follower = None
+        self.compare_widget = None
+        self.parse_thread = None
+        self.parse_worker = None
+        self.index = None
+        self.index_thread = None
+        self.index_worker = None
+        self.summary_thread = None
+        self.summary_worker = None
+        self.follow_timer = QtCore.QTimer(self)
+        self.follow_timer.setInterval(1000)
+        self.follow_timer.timeout.connect(self.poll_follower)
 
         # Add main sub-widgets
         self.add_main_widgets()
@@ -30,7 +587,7 @@ class MainWidget(QtWidgets.QWidget):
         # Select log file
         self.fileLayout = QtWidgets.QHBoxLayout()
         self.file_text = QtWidgets.QLineEdit()
-        self.file_text.setPlaceholderText("Search or Enter .log file")
+        self.file_text.setPlaceholderText("Search or Enter .log file (.log.gz, .log.xz... are read too)")
         self.file_button = QtWidgets.QPushButton("Browse")
         self.file_button.clicked.connect(self.click_file_button)
         self.fileLayout.addWidget(self.file_text)
@@ -38,23 +595,63 @@ class MainWidget(QtWidgets.QWidget):
 
         self.mainLayout.addLayout(self.fileLayout)
 
+        self.readLayout = QtWidgets.QHBoxLayout()
         self.read_data = QtWidgets.QPushButton("Read Data")
         self.read_data.clicked.connect(self.get_data_from_file)
-        self.mainLayout.addWidget(self.read_data)
+        self.follow_check = QtWidgets.QCheckBox("Follow")
+        self.follow_check.setToolTip("Keep reading lines appended to the .log file while it is being rendered")
+        self.follow_check.toggled.connect(self.toggle_follow)
+        self.cancel_button = QtWidgets.QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_parse)
+        self.cancel_button.setEnabled(False)
+        self.readLayout.addWidget(self.read_data)
+        self.readLayout.addWidget(self.follow_check)
+        self.readLayout.addWidget(self.cancel_button)
+        self.mainLayout.addLayout(self.readLayout)
+
+        self.progress_bar = QtWidgets.QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.hide()
+        self.mainLayout.addWidget(self.progress_bar)
+
+        self.summary_label = QtWidgets.QLabel("")
+        self.mainLayout.addWidget(self.summary_label)
 
         self.spacer1 = QtWidgets.QSpacerItem(0,20)
         self.mainLayout.addSpacerItem(self.spacer1)
 
+        # Filter
+        self.filterLayout = QtWidgets.QHBoxLayout()
+        self.filter_text = QtWidgets.QLineEdit()
+        self.filter_text.setPlaceholderText("Filter: warnings containing missing, between 02:00:00 and 02:10:00, "
+                                            "mem > 20G")
+        self.filter_text.returnPressed.connect(self.apply_filter)
+        self.filter_text.setEnabled(False)
+        self.filter_status = QtWidgets.QLabel("")
+        self.filterLayout.addWidget(self.filter_text)
+        self.filterLayout.addWidget(self.filter_status)
+        self.mainLayout.addLayout(self.filterLayout)
+
+        # ADD chart
+
+        self.chartGroup = QtWidgets.QGroupBox("MEM over time")
+        self.chartLayout = QtWidgets.QVBoxLayout()
+        self.memoryChart = MemoryChart()
+        self.chartLayout.addWidget(self.memoryChart)
+        self.chartGroup.setLayout(self.chartLayout)
+        self.mainLayout.addWidget(self.chartGroup)
+
         # ADD num widgets
 
         self.numsGroup = QtWidgets.QGroupBox("Time/MEM")
         self.numsLayout = QtWidgets.QVBoxLayout()
 
-        table_len = len(self.nums)
-        self.numWidget = QtWidgets.QTableWidget(table_len, 4)
-        self.numWidget.setHorizontalHeaderLabels(["Time", "Mem", "WARNING", "Info"])
+        self.numModel = NumTableModel(self)
+        self.numWidget = QtWidgets.QTableView()
+        self.numWidget.setModel(self.numModel)
         self.numWidget.verticalHeader().setVisible(False)
         header = self.numWidget.horizontalHeader()
+        header.setResizeContentsPrecision(FETCH_SIZE)
         header.setSectionResizeMode(3, QtWidgets.QHeaderView.ResizeToContents)
 
         self.numsLayout.addWidget(self.numWidget)
@@ -69,12 +666,19 @@ class MainWidget(QtWidgets.QWidget):
         self.errorsWarningsGroup = QtWidgets.QGroupBox("ERROR/WARNINGS")
         self.errorsWarningsLayout = QtWidgets.QVBoxLayout()
 
-        table_len = len(self.warnings) + len(self.errors)
-        self.warningsErrors = QtWidgets.QTableWidget(table_len, 2)
-        self.warningsErrors.setHorizontalHeaderLabels(["Type", "Info"])
+        self.group_check = QtWidgets.QCheckBox("Group repeated messages")
+        self.group_check.setToolTip("One row per distinct problem, frame numbers, paths and addresses are ignored")
+        self.group_check.toggled.connect(self.toggle_groups)
+        self.errorsWarningsLayout.addWidget(self.group_check)
+        self.problemModel = ProblemGroupTableModel(self)
+
+        self.warningsErrorsModel = WarningErrorTableModel(self)
+        self.warningsErrors = QtWidgets.QTableView()
+        self.warningsErrors.setModel(self.warningsErrorsModel)
         self.warningsErrors.verticalHeader().setVisible(False)
 
         header = self.warningsErrors.horizontalHeader()
+        header.setResizeContentsPrecision(FETCH_SIZE)
         header.setSectionResizeMode(1, QtWidgets.QHeaderView.ResizeToContents)
 
         self.errorsWarningsLayout.addWidget(self.warningsErrors)
@@ -96,17 +700,201 @@ class MainWidget(QtWidgets.QWidget):
         self.clearTableButton = QtWidgets.QPushButton("Clear")
         self.clearTableButton.clicked.connect(self.clear_tables)
         self.bottomLayout.addWidget(self.clearTableButton)
+
+        self.compareButton = QtWidgets.QPushButton("Compare...")
+        self.compareButton.setToolTip("Compare the time and MEM of each frame with other .log files")
+        self.compareButton.clicked.connect(self.open_compare)
+        self.bottomLayout.addWidget(self.compareButton)
         self.mainLayout.addLayout(self.bottomLayout)
 
     def get_data_from_file(self):
         self.clear_tables()
         self.file = self.file_text.text()
 
-        if os.path.exists(self.file) and self.file.split(".")[-1] == "log":
-            lines = readLogFile(self.file)
-            nums, errors, warnings = getTimeUsageErrors(lines)
-            self.nums = nums; self.errors = errors; self.warnings = warnings
+        if os.path.isfile(self.file) and (isLogFile(self.file) or compressionOf(self.file) is not None):
+            # Compressed archives are parsed once, they are not written to anymore
+            if self.follow_check.isChecked() and compressionOf(self.file) is None:
+                self.start_follow()
+                return
+            self.start_parse()
+
+    def start_parse(self, follower=None):
+        """Parse the file in a worker thread, rows are added to the tables batch by batch
+
+        :param follower: follower to parse the file with, it is polled once the parse is done  -LogFollower
+        """
+        self.nums = NumColumns()
+        self.add_data_to_tables()
+
+        self.parse_thread = QtCore.QThread(self)
+        self.parse_worker = ParseWorker(self.file, follower)
+        self.parse_worker.moveToThread(self.parse_thread)
+        self.parse_thread.started.connect(self.parse_worker.run)
+        self.parse_worker.batchReady.connect(self.add_parsed_batch)
+        self.parse_worker.progress.connect(self.progress_bar.setValue)
+        self.parse_worker.finished.connect(self.parse_finished)
+        self.parse_worker.finished.connect(self.parse_thread.quit)
+
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.cancel_button.setEnabled(True)
+        self.parse_thread.start()
+
+    def add_parsed_batch(self, nums, errors, warnings):
+        if self.sender() is not self.parse_worker:
+            return
+        self.append_data_to_tables(nums, errors, warnings)
+
+    def parse_finished(self, completed, error):
+        # A worker dropped before its signal came in is no sender anymore
+        if self.parse_worker is None or self.sender() is not self.parse_worker:
+            return
+        follower = self.parse_worker.follower
+        self.parse_worker = None
+        self.parse_thread = None
+        self.progress_bar.hide()
+        self.cancel_button.setEnabled(False)
+        if error:
+            self.follower = None
+            self.summary_label.setText(error)
+            self.build_index()
+            return
+        if follower is not None:
+            if follower is self.follower:
+                self.numModel.setProvisional(follower.lastNum)
+                self.follow_timer.start()
+                return
+            # Follow was unchecked while the file was parsed
+            self.append_data_to_tables(*follower.flush())
+        self.show_summary()
+        self.build_index()
+
+    def build_index(self):
+        """Index the records in a worker thread, the filter is enabled once it is ready"""
+        self.index_worker = IndexWorker(self.nums, self.errors, self.warnings)
+        self.index_thread = QtCore.QThread(self)
+        self.index_worker.moveToThread(self.index_thread)
+        self.index_thread.started.connect(self.index_worker.run)
+        self.index_worker.indexReady.connect(self.index_ready)
+        self.index_worker.indexReady.connect(self.index_thread.quit)
+        self.filter_status.setText("Indexing...")
+        self.index_thread.start()
+
+    def index_ready(self, index):
+        if self.sender() is not self.index_worker:
+            return
+        self.index = index
+        self.filter_status.setText("")
+        self.filter_text.setEnabled(True)
+
+    def reset_index(self):
+        """Drop the index and the filter, to call when the records change"""
+        if self.index_worker is not None:
+            self.index_worker.indexReady.disconnect(self.index_ready)
+            self.index_worker = None
+        self.index = None
+        self.filter_text.setEnabled(False)
+        self.filter_status.setText("")
+
+    def apply_filter(self):
+        if self.index is None:
+            return
+        try:
+            results = self.index.search(self.filter_text.text())
+        except ValueError as error:
+            self.filter_status.setText(str(error))
+            return
+
+        self.numModel.setRowFilter(results["nums"])
+        warningRows, errorRows = results["warnings"], results["errors"]
+        if warningRows is None and errorRows is None:
+            self.warningsErrorsModel.setRowFilter(None)
+        else:
+            rows = list(range(len(self.warnings)) if warningRows is None else warningRows)
+            offset = len(self.warnings)
+            rows.extend(offset + row for row in (range(len(self.errors)) if errorRows is None else errorRows))
+            self.warningsErrorsModel.setRowFilter(rows)
+        self.refresh_groups()
+        self.filter_status.setText("{0} lines, {1} warnings/errors".format(
+            self.numModel.recordCount(), self.warningsErrorsModel.recordCount()))
+
+    def cancel_parse(self):
+        """Stop the running parse, rows already added stay in the tables"""
+        if self.parse_worker is None:
+            return
+        self.parse_worker.cancel()
+        self.parse_worker.batchReady.disconnect(self.add_parsed_batch)
+        self.parse_thread.quit()
+        self.parse_thread.wait()
+        self.parse_worker = None
+        self.parse_thread = None
+        self.progress_bar.hide()
+        self.cancel_button.setEnabled(False)
+        # A follower stopped in the middle of the file can't be polled from there
+        self.follower = None
+
+    def toggle_follow(self, checked):
+        if checked:
+            self.get_data_from_file()
+        elif self.parse_worker is not None:
+            # The parse goes on to the end of the file and is summarized once done
+            self.follower = None
+        elif self.follower is not None:
+            self.stop_follow()
+            self.show_summary()
+            self.build_index()
+
+    def start_follow(self):
+        """Parse the file in a worker thread then keep polling it, only appended lines are parsed and added to the
+        tables"""
+        self.follower = LogFollower(self.file)
+        self.start_parse(self.follower)
+
+    def stop_follow(self, flush=True):
+        """Stop polling, what the follower still holds (the last line) is added to the tables
+
+        :param flush: False when the records are dropped anyway  -bool
+        """
+        self.follow_timer.stop()
+        if self.follower is None or not flush:
+            self.follower = None
+            return
+        self.poll_follower()
+        self.numModel.setProvisional(None)
+        self.append_data_to_tables(*self.follower.flush())
+        self.follower = None
+
+    def poll_follower(self):
+        if self.follower is None or self.parse_worker is not None or not self.follower.changed():
+            return
+        nums, errors, warnings = self.follower.poll()
+        # The last line is shown grayed until the next poll tells if a WARNING line flags it
+        self.numModel.setProvisional(None)
+        if self.follower.rewound:
+            self.nums = NumColumns(); self.errors = []; self.warnings = []
+            self.problems = logs_groups.ProblemGroups()
             self.add_data_to_tables()
+        self.append_data_to_tables(nums, errors, warnings)
+        self.numModel.setProvisional(self.follower.lastNum)
+
+    def show_summary(self):
+        """Summarize the records in a worker thread, the label and the chart are set once it is done"""
+        self.summary_worker = SummaryWorker(self.nums)
+        self.summary_thread = QtCore.QThread(self)
+        self.summary_worker.moveToThread(self.summary_thread)
+        self.summary_thread.started.connect(self.summary_worker.run)
+        self.summary_worker.summaryReady.connect(self.summary_ready)
+        self.summary_worker.summaryReady.connect(self.summary_thread.quit)
+        self.summary_label.setText("Summarizing...")
+        self.summary_thread.start()
+
+    def summary_ready(self, pyramid, stats):
+        if self.summary_worker is None or self.sender() is not self.summary_worker:
+            return
+        self.memoryChart.set_pyramid(pyramid)
+        self.summary_label.setText("Total time: {0}    Peak MEM: {1}    Mean MEM: {2}    MEM growth: {3}/s".format(
+            secondsToTime(stats.totalTime), logs_stats.formatBytes(stats.peakMem),
+            logs_stats.formatBytes(stats.meanMem), logs_stats.formatBytes(stats.memGrowthRate)))
 
     def click_file_button(self):
         fileBrowser = QtWidgets.QFileDialog()
@@ -115,42 +903,72 @@ class MainWidget(QtWidgets.QWidget):
         self.file_text.setText(file[0])
 
     def add_data_to_tables(self):
+        self.numModel.setRecords(self.nums)
+        self.warningsErrorsModel.setRecords(self.errors, self.warnings)
+        self.refresh_groups()
 
-        # ADD num widgets
-        for i, num in enumerate(self.nums):
-            self.numWidget.insertRow(i)
-            self.numWidget.setCellWidget(i, 0, QtWidgets.QLabel(" "*10 + num.time))
-            self.numWidget.setCellWidget(i, 1, QtWidgets.QLabel(" "*10 + num.mem))
-            if num.warning:
-                self.numWidget.setCellWidget(i, 2, QtWidgets.QLabel(" " * 10 + "WARNING"))
-            else:
-                self.numWidget.setCellWidget(i, 2, QtWidgets.QLabel(" " * 10 + ""))
-            self.numWidget.setCellWidget(i, 3, QtWidgets.QLabel(" "*10 + num.info))
-
-        # ADD ERROR WARNINGS
-
-        warningErrors = self.warnings + self.errors
-
-        for i, wE in enumerate(warningErrors):
-            self.warningsErrors.insertRow(i)
-            if isinstance(wE, Warning):
-                self.warningsErrors.setCellWidget(i, 0, QtWidgets.QLabel(" "*10 + "WARNING"))
-            else:
-                self.warningsErrors.setCellWidget(i, 0, QtWidgets.QLabel(" " * 10 + "ERROR"))
-            self.warningsErrors.setCellWidget(i, 1, QtWidgets.QLabel(" "*10 + wE.info))
+    def toggle_groups(self, checked):
+        self.warningsErrors.setModel(self.problemModel if checked else self.warningsErrorsModel)
+        header = self.warningsErrors.horizontalHeader()
+        header.setSectionResizeMode(len(self.warningsErrors.model().headers) - 1,
+                                    QtWidgets.QHeaderView.ResizeToContents)
+        self.refresh_groups()
+
+    def refresh_groups(self):
+        """Show the groups of the warnings/errors, only the filtered ones when there is a filter"""
+        if not self.group_check.isChecked():
+            return
+        rows = self.warningsErrorsModel.rows
+        if rows is None:
+            problems = self.problems
+        else:
+            problems = logs_groups.ProblemGroups()
+            warningCount = len(self.warnings)
+            for row in rows:
+                problems.add(self.warnings[row] if row < warningCount else self.errors[row - warningCount])
+        self.problemModel.setGroups(problems.sortedGroups())
+
+    def append_data_to_tables(self, nums, errors, warnings):
+        """Add records at the end of the data, only the rows the views already show are inserted"""
+        previousNums = len(self.nums)
+        previousWarnings = len(self.warnings)
+        previousErrors = len(self.errors)
+        self.nums.extend(nums); self.errors.extend(errors); self.warnings.extend(warnings)
+        self.problems.addRecords(errors, warnings)
+        self.numModel.recordsAppended(previousNums)
+        self.warningsErrorsModel.recordsAppended(previousWarnings, previousErrors)
+        self.refresh_groups()
 
     def clear_tables(self):
-        while(self.numWidget.rowCount() > 0):
-            self.numWidget.removeRow(0)
-
-        while (self.warningsErrors.rowCount() > 0):
-            self.warningsErrors.removeRow(0)
+        self.cancel_parse()
+        self.stop_follow(flush=False)
+        self.reset_index()
+        self.summary_worker = None
+        self.nums = []
         self.errors = []
         self.warnings = []
+        self.problems = logs_groups.ProblemGroups()
+        self.add_data_to_tables()
+        self.summary_label.setText("")
+        self.memoryChart.set_pyramid(None)
+
+    def open_compare(self):
+        self.compare_widget = CompareWidget([self.file_text.text()])
+        self.compare_widget.show()
 
     def close_widget(self):
+        self.cancel_parse()
         self.close()
 
+    def closeEvent(self, event):
+        self.cancel_parse()
+        self.stop_follow(flush=False)
+        # Index and summary workers can't be stopped, their threads are waited for so none is destroyed running
+        for thread in self.findChildren(QtCore.QThread):
+            thread.quit()
+            thread.wait()
+        super(MainWidget, self).closeEvent(event)
+
 if __name__ == '__main__':
     app = QtWidgets.QApplication([])
     window = MainWidget()